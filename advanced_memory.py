@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 import json
 from enum import Enum
 import asyncio
-from langchain.schema import BaseMemory
+from langchain_core.memory import BaseMemory
 from pydantic import BaseModel
 
 # ============================================================================
@@ -0,0 +1,525 @@
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# APPROXIMATE NEAREST-NEIGHBOUR INDEX TYPES
+# ============================================================================
+#
+# The FAISS index behind the vector store is chosen with RAG_VECTOR_INDEX:
+#
+#   flat   exact search, cost linear in the corpus (default)
+#   ivf    inverted lists over k-means cells; searches nprobe of nlist cells
+#   hnsw   navigable small-world graph; no training, efSearch trades speed
+#   pq     product-quantized codes (pq_m bytes per vector at 8 bits)
+#
+# All types use L2 distance, which ranks the normalized embeddings the same
+# way as cosine similarity. IVF and PQ are trained on the embeddings of the
+# full build and then accept incremental adds; when the corpus is too small
+# to train them (FAISS wants ~39 points per centroid) a flat index is built
+# instead, and retraining_needed() asks for a rebuild once it has grown.
+# Search-time settings (nprobe, efSearch, rescore) are applied on load, so
+# they can be tuned without rebuilding; the other settings are part of the
+# snapshot manifest and trigger a rebuild when changed.
+#
+# Vectors can also be stored compactly (opt-in), whatever the index type:
+#
+#   RAG_VECTOR_COMPRESSION  float16 (2 bytes per dimension) or int8 (1 byte,
+#                           with a trained min/max scale per dimension)
+#   RAG_VECTOR_PCA_DIM      project to this many dimensions with a PCA fitted
+#                           on the vectors of the full build
+#
+# FAISS scores queries against the compact codes directly. With
+# RAG_VECTOR_RESCORE=n, n * k candidates are fetched and re-ranked with the
+# full-precision vectors the embedding cache already holds (rescore_hits()).
+# The cache memory-maps those vectors, so rescoring only makes the rows of
+# candidates resident, not a second full-precision copy of the corpus.
+#
+# Running this module reports recall@k and latency of each index type, or
+# memory saved and recall lost by each compression, against exact search on
+# the vectors of the saved snapshot:
+#
+#   python ann_index.py [snapshot_dir] [k] [index_type ... | compression]
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq")
+VECTOR_INDEX_SETTINGS = {
+    "type": os.getenv("RAG_VECTOR_INDEX", "flat").lower(),
+    "nlist": int(os.getenv("RAG_IVF_NLIST", "0")),  # 0 picks about 4 * sqrt(n) cells
+    "nprobe": int(os.getenv("RAG_IVF_NPROBE", "8")),
+    "hnsw_m": int(os.getenv("RAG_HNSW_M", "32")),
+    "ef_construction": int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "80")),
+    "ef_search": int(os.getenv("RAG_HNSW_EF_SEARCH", "64")),
+    "pq_m": int(os.getenv("RAG_PQ_M", "0")),  # Sub-quantizers; 0 picks dimension / 8
+    "pq_bits": int(os.getenv("RAG_PQ_BITS", "8")),
+    "compression": os.getenv("RAG_VECTOR_COMPRESSION", "none").lower(),
+    "pca_dim": int(os.getenv("RAG_VECTOR_PCA_DIM", "0")),  # 0 keeps the model's dimension
+    "rescore": int(os.getenv("RAG_VECTOR_RESCORE", "0")),  # Candidates per result re-ranked; 0 disables
+}
+SEARCH_SETTINGS = ("nprobe", "ef_search", "rescore")
+COMPRESSIONS = {"none": "Flat", "float16": "SQfp16", "int8": "SQ8"}  # index_factory codecs
+MIN_POINTS_PER_CENTROID = 39
+MIN_IVF_LISTS = 8  # Fewer cells than this saves too little over flat to be worth it
+# Search-time values the report tries in addition to the configured one
+SEARCH_SWEEPS = {"ivf": ("nprobe", (1, 4, 16, 64)), "hnsw": ("ef_search", (16, 32, 128))}
+RETRAIN_GROWTH = 4.0  # Retrain IVF/PQ once the corpus is this many times the training set
+
+
+def build_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Settings that determine the built index (recorded in the snapshot manifest)"""
+    if settings["type"] not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type {settings['type']!r}; choose one of {', '.join(INDEX_TYPES)}")
+    if settings["compression"] not in COMPRESSIONS:
+        raise ValueError(f"Unknown vector compression {settings['compression']!r}; choose one of {', '.join(COMPRESSIONS)}")
+    return {key: value for key, value in settings.items() if key not in SEARCH_SETTINGS}
+
+
+def ivf_nlist(num_vectors: int, settings: Dict[str, Any]) -> int:
+    nlist = settings["nlist"] or int(4 * np.sqrt(num_vectors))
+    return min(nlist, num_vectors // MIN_POINTS_PER_CENTROID)
+
+
+def pq_subquantizers(dimension: int, settings: Dict[str, Any]) -> int:
+    pq_m = settings["pq_m"] or max(dimension // 8, 1)
+    while dimension % pq_m:
+        pq_m -= 1
+    return pq_m
+
+
+def trainable(index_type: str, num_vectors: int, settings: Dict[str, Any]) -> bool:
+    """Whether there are enough vectors to train an index of this type"""
+    if index_type == "ivf":
+        return ivf_nlist(num_vectors, settings) >= MIN_IVF_LISTS
+    if index_type == "pq":
+        return num_vectors >= MIN_POINTS_PER_CENTROID * 2 ** settings["pq_bits"]
+    return True
+
+
+def pca_trainable(num_vectors: int, dimension: int, settings: Dict[str, Any]) -> bool:
+    """Whether a PCA to pca_dim can be fitted (it needs at least as many vectors as dimensions)"""
+    return 0 < settings["pca_dim"] < dimension and num_vectors >= dimension
+
+
+def factory_string(dimension: int, index_type: str, settings: Dict[str, Any],
+                   num_vectors: int = 0, pca_dim: int = 0) -> str:
+    """faiss.index_factory description of an index type with the configured compression"""
+    codec = COMPRESSIONS[settings["compression"]]
+    if index_type == "ivf":
+        description = f"IVF{ivf_nlist(num_vectors, settings)},{codec}"
+    elif index_type == "hnsw":
+        description = f"HNSW{settings['hnsw_m']}" + ("" if codec == "Flat" else f"_{codec}")
+    elif index_type == "pq":
+        description = f"PQ{pq_subquantizers(pca_dim or dimension, settings)}x{settings['pq_bits']}"
+    else:
+        description = codec
+    return f"PCA{pca_dim},{description}" if pca_dim else description
+
+
+def create_index(dimension: int, index_type: str, settings: Dict[str, Any],
+                 num_vectors: int = 0, pca_dim: int = 0) -> Any:
+    """Empty FAISS index of one type; IVF, PQ, int8 and PCA still need train()"""
+    import faiss
+
+    index = faiss.index_factory(dimension, factory_string(dimension, index_type, settings, num_vectors, pca_dim),
+                                faiss.METRIC_L2)
+    hnsw = getattr(base_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efConstruction = settings["ef_construction"]
+    return index
+
+
+def base_index(index: Any) -> Any:
+    """The index behind any PCA transform, downcast to its concrete class"""
+    import faiss
+
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def configure_search(index: Any, settings: Dict[str, Any]) -> Any:
+    """Apply search-time settings (IVF nprobe, HNSW efSearch) to an index"""
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(settings["nprobe"], ivf.nlist)
+    hnsw = getattr(base_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = settings["ef_search"]
+    return index
+
+
+def index_type_of(index: Any) -> str:
+    import faiss
+
+    index = base_index(index)
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    return "flat"
+
+
+def compression_of(index: Any) -> str:
+    """How an index stores vectors: none, float16, int8 or pq"""
+    import faiss
+
+    index = base_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    sq = getattr(index, "sq", None)
+    if sq is None:
+        return "none"
+    return {faiss.ScalarQuantizer.QT_fp16: "float16", faiss.ScalarQuantizer.QT_8bit: "int8"}.get(sq.qtype, "sq")
+
+
+def stores_full_vectors(index: Any) -> bool:
+    """Whether an index keeps every vector uncompressed and unprojected"""
+    import faiss
+
+    if isinstance(faiss.downcast_index(index), faiss.IndexPreTransform):
+        return False
+    return isinstance(base_index(index), (faiss.IndexFlat, faiss.IndexHNSWFlat, faiss.IndexIVFFlat))
+
+
+def code_bytes(index: Any) -> int:
+    """Bytes stored per vector, excluding graph links and list overhead"""
+    import faiss
+
+    base = base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.downcast_index(base.storage).sa_code_size()
+    return index.sa_code_size()
+
+
+def build_index(vectors: np.ndarray, settings: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    """Train an index of the configured type on vectors and add them.
+
+    Returns the index and a description of what was built, which falls back
+    to flat when there are too few vectors to train the configured type.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dimension = vectors.shape
+    index_type = settings["type"]
+    pca_dim = settings["pca_dim"] if pca_trainable(num_vectors, dimension, settings) else 0
+    if settings["pca_dim"] and not pca_dim:
+        logger.info(f"Cannot fit a {settings['pca_dim']}-dimensional PCA to {num_vectors} vectors of dimension {dimension}; skipping it")
+    if not trainable(index_type, num_vectors, settings):
+        logger.info(f"Too few vectors ({num_vectors}) to train a {index_type} index; using flat")
+        index_type = "flat"
+
+    started = time.perf_counter()
+    index = create_index(dimension, index_type, settings, num_vectors, pca_dim)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    configure_search(index, settings)
+    trained = index_type in ("ivf", "pq") or pca_dim or settings["compression"] == "int8"
+    built = {
+        "type": index_type,
+        "compression": compression_of(index),
+        "dimension": dimension,
+        "pca_dim": pca_dim,
+        "trained_vectors": num_vectors if trained else 0,
+        "build_seconds": round(time.perf_counter() - started, 3),
+    }
+    if index_type == "ivf":
+        built["nlist"] = base_index(index).nlist
+    if index_type == "pq":
+        built["pq_m"] = base_index(index).pq.M
+    logger.info(f"Built {index_type} vector index ({built['compression']}, {pca_dim or dimension} dimensions) "
+                f"over {num_vectors} vectors in {built['build_seconds']:.2f}s")
+    return index, built
+
+
+def build_vector_store(chunk_store: Any, keys: List[int], vectors: np.ndarray, embeddings: Any,
+                       settings: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    """LangChain FAISS store over pre-embedded chunks, with the configured index type.
+
+    Index positions map to chunk keys and the chunk store serves as docstore.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    index, built = build_index(vectors, settings)
+    store = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=chunk_store,
+        index_to_docstore_id=dict(enumerate(keys)),
+    )
+    return store, built
+
+
+def add_to_store(store: Any, keys: List[int], vectors: np.ndarray):
+    """Append vectors of chunks already in the store's chunk store"""
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if store._normalize_L2:
+        faiss.normalize_L2(vectors)
+    start = store.index.ntotal
+    store.index.add(vectors)
+    store.index_to_docstore_id.update({start + i: key for i, key in enumerate(keys)})
+
+
+def retraining_needed(built: Optional[Dict[str, Any]], num_vectors: int, settings: Dict[str, Any]) -> bool:
+    """Whether an index built as described should be rebuilt for its current size"""
+    if not built:
+        return False
+    if settings["pca_dim"] and not built.get("pca_dim") and pca_trainable(num_vectors, built.get("dimension", 0), settings):
+        return True
+    if built["type"] != settings["type"]:
+        return trainable(settings["type"], num_vectors, settings)
+    trained = built.get("trained_vectors", 0)
+    return bool(trained) and num_vectors >= RETRAIN_GROWTH * trained
+
+
+def delete_from_store(store: Any, keys: List[int]):
+    """Remove chunks (by key) from a FAISS store in place, whatever its index type.
+
+    Flat and PQ indexes renumber positions on removal, as LangChain's
+    delete() expects. IVF keeps the removed positions' ids and HNSW cannot
+    remove at all, so those are emptied and refilled with the remaining
+    vectors; their training (IVF centroids, HNSW parameters, PCA and
+    quantizer ranges) is kept, and decoded compact vectors re-encode to the
+    same codes.
+    """
+    import faiss
+
+    index = faiss.downcast_index(store.index)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None and not isinstance(base_index(index), faiss.IndexHNSW):
+        store.delete(keys)
+        return
+    removed = set(keys)
+    keep = [i for i, key in sorted(store.index_to_docstore_id.items()) if key not in removed]
+    if ivf is not None:
+        ivf.make_direct_map()
+    vectors = index.reconstruct_n(0, index.ntotal)[keep]
+    index.reset()
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+    index.add(vectors)
+    store.docstore.delete(keys)
+    store.index_to_docstore_id = {new: store.index_to_docstore_id[i] for new, i in enumerate(keep)}
+
+
+def index_vectors(index: Any) -> np.ndarray:
+    """Copy of all vectors in an index, in position order (decoded approximations if compact)"""
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        # reconstruct needs a position -> list map, which is built on a copy
+        index = faiss.clone_index(index)
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def index_bytes(index: Any) -> int:
+    """Serialized size of a FAISS index"""
+    import faiss
+
+    return int(faiss.serialize_index(index).size)
+
+
+def index_stats(store: Any, built: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    import faiss
+
+    index = store.index
+    stats = {
+        "type": index_type_of(index),
+        "vectors": index.ntotal,
+        "dimension": index.d,
+        "stored_dimension": base_index(index).d,
+        "compression": compression_of(index),
+        "code_bytes_per_vector": code_bytes(index),
+    }
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        stats.update(nlist=ivf.nlist, nprobe=ivf.nprobe)
+    hnsw = getattr(base_index(index), "hnsw", None)
+    if hnsw is not None:
+        stats["ef_search"] = hnsw.efSearch
+    if built:
+        stats["trained_vectors"] = built.get("trained_vectors", 0)
+    return stats
+
+
+def rescore_hits(query_vectors: np.ndarray, results: List[List[Tuple[Any, float]]],
+                 full_vectors: Callable[[List[Any]], List[Optional[np.ndarray]]],
+                 k: int) -> List[List[Tuple[Any, float]]]:
+    """Re-rank candidate (document, score) lists by full-precision cosine similarity.
+
+    full_vectors returns the original vector of each document, or None, in
+    which case the candidate keeps its compact score.
+    """
+    rescored = []
+    for query, hits in zip(np.atleast_2d(query_vectors), results):
+        query = query / (np.linalg.norm(query) or 1.0)
+        vectors = full_vectors([doc for doc, _ in hits])
+        scored = [
+            (doc, score if vector is None else float(np.dot(query, vector) / (np.linalg.norm(vector) or 1.0)))
+            for (doc, score), vector in zip(hits, vectors)
+        ]
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        rescored.append(scored[:k])
+    return rescored
+
+
+# ============================================================================
+# RECALL / LATENCY AND COMPRESSION REPORTS
+# ============================================================================
+
+def split_queries(vectors: np.ndarray, num_queries: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hold out a random sample of vectors as queries; returns (queries, base)"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    num_queries = max(1, min(num_queries, len(vectors) // 10))
+    return vectors[order[:num_queries]], vectors[order[num_queries:]]
+
+def compare_index_types(vectors: np.ndarray, settings: Dict[str, Any], index_types: Optional[List[str]] = None,
+                        k: int = 10, num_queries: int = 200, seed: int = 0) -> List[Dict[str, Any]]:
+    """Recall@k and per-query latency of each index type against exact search.
+
+    A random sample of the vectors is held out as queries and the rest are
+    indexed. Queries are searched one at a time, as the service does. IVF
+    and HNSW are built once and measured at several nprobe / efSearch values.
+    """
+    queries, base = split_queries(vectors, num_queries, seed)
+    num_queries, k = len(queries), min(k, len(base))
+
+    exact, _ = build_index(base, dict(settings, type="flat", compression="none", pca_dim=0))
+    _, truth = exact.search(queries, k)
+
+    reports = []
+    for index_type in index_types or list(INDEX_TYPES):
+        index, built = build_index(base, dict(settings, type=index_type))
+        name, values = SEARCH_SWEEPS.get(built["type"], (None, ()))
+        search_settings = [settings]
+        if name:
+            search_settings = [dict(settings, **{name: value}) for value in sorted({*values, settings[name]})]
+        for search in search_settings:
+            configure_search(index, search)
+            latencies, hits = [], 0
+            for i in range(num_queries):
+                started = time.perf_counter()
+                _, found = index.search(queries[i:i + 1], k)
+                latencies.append(time.perf_counter() - started)
+                hits += len(set(found[0]) & set(truth[i]))
+            reports.append({
+                "type": index_type,
+                "built": built["type"],
+                "setting": f"{name}={search[name]}" if name else "",
+                "vectors": len(base),
+                "build_seconds": built["build_seconds"],
+                "index_mb": round(index_bytes(index) / (1024 * 1024), 2),
+                "mean_ms": round(1000 * float(np.mean(latencies)), 3),
+                "p95_ms": round(1000 * float(np.percentile(latencies, 95)), 3),
+                f"recall@{k}": round(hits / (num_queries * k), 4),
+            })
+    return reports
+
+
+def resident_memory_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def compare_compressions(vectors: np.ndarray, settings: Dict[str, Any], k: int = 10,
+                         num_queries: int = 200, seed: int = 0) -> List[Dict[str, Any]]:
+    """Memory saved and recall@k lost by each compression, with and without rescoring.
+
+    Uses the configured index type; rescoring re-ranks rescore * k
+    candidates (4 * k if rescoring is off) with the uncompressed vectors.
+    memory_saved compares index sizes alone; rescored_saved also counts the
+    full-precision rows rescoring read, which is what becomes resident of the
+    memory-mapped embedding cache. resident_mb is the process's resident set
+    after building and searching each variant.
+    """
+    queries, base = split_queries(vectors, num_queries, seed)
+    num_queries, k = len(queries), min(k, len(base))
+    dimension = base.shape[1]
+    rescore = settings["rescore"] or 4
+
+    exact, _ = build_index(base, dict(settings, type="flat", compression="none", pca_dim=0))
+    _, truth = exact.search(queries, k)
+
+    variants = [("none", 0), ("float16", 0), ("int8", 0), ("none", dimension // 2), ("none", dimension // 4),
+                ("int8", dimension // 2)]
+    if settings["pca_dim"] and (settings["compression"], settings["pca_dim"]) not in variants:
+        variants.append((settings["compression"], settings["pca_dim"]))
+
+    reports, full_bytes = [], None
+    for compression, pca_dim in variants:
+        index, built = build_index(base, dict(settings, compression=compression, pca_dim=pca_dim))
+        size = index_bytes(index)
+        full_bytes = full_bytes or size
+        candidates = min(rescore * k, len(base))
+        latencies, hits, rescored_hits, rescored_rows = [], 0, 0, set()
+        for i in range(num_queries):
+            started = time.perf_counter()
+            _, found = index.search(queries[i:i + 1], candidates)
+            latencies.append(time.perf_counter() - started)
+            found = found[0][found[0] >= 0]
+            hits += len(set(found[:k]) & set(truth[i]))
+            reranked = found[np.argsort(-(base[found] @ queries[i]))][:k]
+            rescored_hits += len(set(reranked) & set(truth[i]))
+            rescored_rows.update(found.tolist())
+        rescore_bytes = len(rescored_rows) * 4 * dimension
+        resident = resident_memory_bytes()
+        reports.append({
+            "compression": compression,
+            "pca_dim": built["pca_dim"] or dimension,
+            "type": built["type"],
+            "bytes_per_vector": code_bytes(index),
+            "index_mb": round(size / (1024 * 1024), 2),
+            "memory_saved": f"{100 * (1 - size / full_bytes):.0f}%",
+            f"recall@{k}": round(hits / (num_queries * k), 4),
+            "rescore_mb": round(rescore_bytes / (1024 * 1024), 2),
+            "rescored": round(rescored_hits / (num_queries * k), 4),
+            "rescored_saved": f"{100 * (1 - (size + rescore_bytes) / full_bytes):.0f}%",
+            "resident_mb": round(resident / (1024 * 1024), 1) if resident is not None else None,
+            "mean_ms": round(1000 * float(np.mean(latencies)), 3),
+        })
+        del index
+    return reports
+
+
+def snapshot_vectors(snapshot_dir: str) -> np.ndarray:
+    """Vectors of a saved snapshot's FAISS index (compact snapshots give decoded approximations)"""
+    import faiss
+
+    return index_vectors(faiss.read_index(os.path.join(snapshot_dir, "index.faiss")))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    target = sys.argv[1] if len(sys.argv) > 1 else os.getenv("RAG_SNAPSHOT_DIR", os.path.join("vectorstore", "faiss_index"))
+    top_k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    if sys.argv[3:] == ["compression"]:
+        columns = ("pca_dim", "type", "bytes_per_vector", "index_mb", "memory_saved", f"recall@{top_k}",
+                   "rescore_mb", "rescored", "rescored_saved", "resident_mb", "mean_ms")
+        print(f"{'compression':<12}" + "".join(f"{column:>17}" for column in columns))
+        for report in compare_compressions(snapshot_vectors(target), VECTOR_INDEX_SETTINGS, top_k):
+            print(f"{report['compression']:<12}" + "".join(f"{str(report[column]):>17}" for column in columns))
+        sys.exit()
+    columns = ("built", "setting", "vectors", "build_seconds", "index_mb", "mean_ms", "p95_ms", f"recall@{top_k}")
+    print(f"{'type':<8}" + "".join(f"{column:>14}" for column in columns))
+    for report in compare_index_types(snapshot_vectors(target), VECTOR_INDEX_SETTINGS, sys.argv[3:] or None, top_k):
+        print(f"{report['type']:<8}" + "".join(f"{str(report[column]):>14}" for column in columns))
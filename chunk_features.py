@@ -0,0 +1,67 @@
+import re
+from typing import Any, Dict
+
+# ============================================================================
+# INGESTION-TIME CHUNK NORMALIZATION AND FEATURES
+# ============================================================================
+#
+# Everything the query path used to derive from chunk text on every request
+# is computed once when a chunk is created and stored in its metadata:
+#
+#   display_text   cleaned text shown to the LLM (raw page_content is kept
+#                  for embedding, BM25 and the cross-encoder)
+#   feature_flags  reranking signals packed into one int: FEATURE_CRM_TERMS
+#                  (mentions a CRM boost term), FEATURE_RECENT
+#
+# The flags are an int rather than a dict so the chunk store keeps no
+# per-chunk container for them (small ints are shared objects). Query-time
+# code reads these with feature_flags() / display_text(), which fall back
+# to computing them for documents built without them.
+
+CRM_BOOST_TERMS = ('studynet', 'crm', 'lead', 'application', 'admission')
+
+FEATURE_CRM_TERMS = 1 << 0
+FEATURE_RECENT = 1 << 1
+
+_MARKUP_RE = re.compile(r"[*_#>`~]")
+_HTML_TAG_RE = re.compile(r"<.*?>")
+_NUMBERED_ITEM_RE = re.compile(r"(\d+\.)\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def clean_display_text(text: str) -> str:
+    """Strip markup and whitespace and put numbered items on their own lines"""
+    text = _MARKUP_RE.sub("", text)
+    text = _HTML_TAG_RE.sub("", text)
+    text = _NUMBERED_ITEM_RE.sub(r"\n\1 ", text)
+    text = _WHITESPACE_RE.sub(" ", text)
+    text = _NUMBERED_ITEM_RE.sub(r"\n\1 ", text)
+    return text.strip()
+
+
+def compute_feature_flags(text: str, metadata: Dict[str, Any]) -> int:
+    content_lower = text.lower()
+    flags = 0
+    if any(term in content_lower for term in CRM_BOOST_TERMS):
+        flags |= FEATURE_CRM_TERMS
+    if 'recent' in str(metadata).lower():
+        flags |= FEATURE_RECENT
+    return flags
+
+
+def add_chunk_features(chunk: Any) -> Any:
+    """Store the display text and feature flags of a freshly created chunk in its metadata"""
+    flags = compute_feature_flags(chunk.page_content, chunk.metadata)
+    chunk.metadata["display_text"] = clean_display_text(chunk.page_content)
+    chunk.metadata["feature_flags"] = flags
+    return chunk
+
+
+def display_text(doc: Any) -> str:
+    text = doc.metadata.get("display_text")
+    return text if text is not None else clean_display_text(doc.page_content)
+
+
+def feature_flags(doc: Any) -> int:
+    flags = doc.metadata.get("feature_flags")
+    return flags if flags is not None else compute_feature_flags(doc.page_content, doc.metadata)
@@ -0,0 +1,208 @@
+import copy
+import sys
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+# ============================================================================
+# CHUNK STORE
+# ============================================================================
+#
+# The one place chunk text and metadata are kept. Every chunk gets an
+# integer key when it is stored; the FAISS index, the keyword index and the
+# exact search matrix refer to chunks by key only, and results from any of
+# them are turned back into Documents here, on demand. Records are compact
+# tuples (no per-chunk metadata dict or pydantic object), and source names
+# are interned so a file's chunks share one string.
+#
+# Keys are never reused and are handed out in increasing order, and a
+# chunk ID maps to one key for as long as its record is stored: adding an
+# ID that is already stored (even tombstoned) is an error, since tombstones
+# are resolved to keys through this mapping. Indexes
+# append chunks in key order and remove them without reordering, so their
+# key arrays stay sorted and are searched with np.searchsorted.
+#
+# Adding chunks makes a new version of the store without copying it: the
+# versions share their record dictionaries and a version only reads keys
+# below its own next_key, so records added for a later version are
+# invisible to it. Changes to existing records (sources credited by
+# add_source, or reassigned by set_sources when a representative's own
+# file is removed) go to a small per-version overlay of replacement records
+# instead of the shared records. Only the
+# newest version is extended in place; extending an older one (whose
+# successor was never published) starts from a copy. Removing chunks is
+# done on a copy as well.
+#
+# The store is also the docstore of the LangChain FAISS wrapper (search,
+# add, delete by key).
+
+class ChunkRecord(NamedTuple):
+    chunk_id: str  # Stable ID: source, file hash and position in the file
+    source: str
+    page: Optional[int]
+    start_index: Optional[int]
+    char_offset: Optional[int]
+    text: str
+    display_text: Optional[str]
+    feature_flags: Optional[int]  # chunk_features.FEATURE_* bits
+    sources: Optional[Tuple[str, ...]] = None  # Files whose near-duplicates this chunk stands in for
+
+
+def key_positions(keys: np.ndarray, wanted: Iterable[int]) -> np.ndarray:
+    """Positions in an ascending key array of the wanted keys that it holds"""
+    wanted = np.fromiter(wanted, dtype=np.int64)
+    positions = np.searchsorted(keys, wanted)
+    found = positions < len(keys)
+    found[found] = keys[positions[found]] == wanted[found]
+    return positions[found]
+
+
+class ChunkStore:
+    """Chunk records by integer key"""
+
+    def __init__(self, records: Optional[Dict[int, ChunkRecord]] = None,
+                 keys: Optional[Dict[str, int]] = None, next_key: int = 0):
+        self.records = records if records is not None else {}
+        self.keys = keys if keys is not None else {}  # Chunk ID -> key
+        self.next_key = next_key
+        self.overrides: Dict[int, ChunkRecord] = {}  # Records changed by this version
+        self._size = len(self.records)
+        self._written = [next_key]  # Keys written to the shared dictionaries
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, key: int) -> bool:
+        return key < self.next_key and key in self.records
+
+    def copy(self) -> "ChunkStore":
+        """Unshared copy of this version that can be changed freely; records themselves are shared"""
+        # dict() copies in one step, even while a newer version adds to the dictionaries
+        records, keys = dict(self.records), dict(self.keys)
+        if self._written[0] != self.next_key:
+            records = {key: record for key, record in records.items() if key < self.next_key}
+            keys = {chunk_id: key for chunk_id, key in keys.items() if key < self.next_key}
+        for key, record in self.overrides.items():
+            if key in records:
+                records[key] = record
+        return ChunkStore(records, keys, self.next_key)
+
+    def extended(self, chunks: Iterable[Any]) -> Tuple["ChunkStore", List[int]]:
+        """New version with chunk Documents added, and their keys; this version is unchanged"""
+        if self._written[0] == self.next_key:
+            version = copy.copy(self)
+            version.overrides = dict(self.overrides)
+        else:
+            version = self.copy()
+        return version, version.add_chunks(chunks)
+
+    def add_chunks(self, chunks: Iterable[Any]) -> List[int]:
+        """Store chunk Documents (which must carry a new chunk_id) in place and return their keys"""
+        keys = []
+        for chunk in chunks:
+            record = self._record(chunk)
+            self._check_new(record.chunk_id)
+            key = self.next_key
+            self.next_key += 1
+            self.records[key] = record
+            self.keys[record.chunk_id] = key
+            self._size += 1
+            keys.append(key)
+        self._written[0] = self.next_key
+        return keys
+
+    def _check_new(self, chunk_id: str):
+        if self.key_of(chunk_id) is not None:
+            raise ValueError(f"Chunk ID {chunk_id} is already stored under key {self.keys[chunk_id]}")
+
+    @staticmethod
+    def _record(chunk: Any) -> ChunkRecord:
+        metadata = chunk.metadata
+        sources = metadata.get("sources")
+        return ChunkRecord(
+            chunk_id=metadata["chunk_id"],
+            source=sys.intern(metadata["source"]),
+            page=metadata.get("page"),
+            start_index=metadata.get("start_index"),
+            char_offset=metadata.get("char_offset"),
+            text=chunk.page_content,
+            display_text=metadata.get("display_text"),
+            feature_flags=metadata.get("feature_flags"),
+            sources=tuple(sys.intern(s) for s in sources) if sources else None,
+        )
+
+    def key_of(self, chunk_id: str) -> Optional[int]:
+        key = self.keys.get(chunk_id)
+        return key if key is not None and key < self.next_key else None
+
+    def keys_of(self, chunk_ids: Iterable[str]) -> List[int]:
+        """Keys of the given chunk IDs that are stored"""
+        keys = (self.keys.get(chunk_id) for chunk_id in chunk_ids)
+        return [key for key in keys if key is not None and key < self.next_key]
+
+    def record(self, key: int) -> ChunkRecord:
+        record = self.overrides.get(key)
+        return record if record is not None else self.records[key]
+
+    def metadata(self, key: int) -> Dict[str, Any]:
+        record = self.record(key)
+        metadata = {
+            "source": record.source,
+            "page": record.page,
+            "start_index": record.start_index,
+            "char_offset": record.char_offset,
+            "display_text": record.display_text,
+            "feature_flags": record.feature_flags,
+            "chunk_id": record.chunk_id,
+            "chunk_key": key,
+        }
+        if record.sources:
+            metadata["sources"] = list(record.sources)
+        return metadata
+
+    def document(self, key: int) -> Document:
+        record = self.record(key)
+        return Document(id=record.chunk_id, page_content=record.text, metadata=self.metadata(key))
+
+    def add_source(self, key: int, source: str):
+        """Record that the chunk also stands in for a near-duplicate from source"""
+        record = self.record(key)
+        sources = record.sources or (record.source,)
+        if source not in sources:
+            self.overrides[key] = record._replace(sources=sources + (sys.intern(source),))
+
+    def set_sources(self, key: int, sources: List[str]):
+        """Reassign the files a chunk stands in for; the first becomes its source"""
+        sources = tuple(sys.intern(source) for source in dict.fromkeys(sources))
+        self.overrides[key] = self.record(key)._replace(source=sources[0], sources=sources if len(sources) > 1 else None)
+
+    def remove(self, keys: Iterable[int]):
+        """Delete records in place; only for a store that is not shared (a copy)"""
+        for key in keys:
+            record = self.records.pop(key, None)
+            if record is not None:
+                self._size -= 1
+                self.overrides.pop(key, None)
+                if self.keys.get(record.chunk_id) == key:
+                    del self.keys[record.chunk_id]
+
+    # LangChain docstore interface, used by the FAISS wrapper
+
+    def search(self, key: int) -> Union[Document, str]:
+        if key not in self:
+            return f"ID {key} not found."
+        return self.document(key)
+
+    def add(self, documents: Dict[int, Any]):
+        for key, document in documents.items():
+            record = self._record(document)
+            self._check_new(record.chunk_id)
+            self.records[key] = record
+            self.keys[record.chunk_id] = key
+            self._size += 1
+            self.next_key = max(self.next_key, key + 1)
+            self._written[0] = max(self._written[0], self.next_key)
+
+    def delete(self, keys: List[int]):
+        self.remove(keys)
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONTENT-ADDRESSED EMBEDDING CACHE
+# ============================================================================
+#
+# One directory per embedding model, holding two append-only data files:
+#
+#   keys.bin      32-byte SHA-256 digest of (model name, chunk text) per row
+#   vectors.bin   float32 embedding per row, in the same order
+#   meta.json     model name and vector dimension
+#
+# Rows are only ever appended, so a crash can at worst leave a trailing
+# partial row, which is cut off on the next load.
+#
+# vectors.bin is memory-mapped rather than read. Only the rows that are
+# actually looked up (texts embedded again, rescoring candidates) become
+# resident, stale rows of deleted chunks stay on disk, and processes using
+# the same cache share its pages. Only the key table is held in memory.
+
+KEY_BYTES = 32
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    """Digest identifying one text under one embedding model"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+
+def model_dir_name(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+class EmbeddingCache:
+    """On-disk embedding store for a single model, keyed by chunk content"""
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, model_dir_name(model_name))
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._rows: Dict[bytes, int] = {}
+        # Read-only map of the first len(self._rows) rows of vectors.bin
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        meta_path = self._file("meta.json")
+        if not os.path.exists(meta_path):
+            return
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+            keys = np.fromfile(self._file("keys.bin"), dtype=np.uint8)
+            row_bytes = 4 * self.dim
+            rows = min(len(keys) // KEY_BYTES, os.path.getsize(self._file("vectors.bin")) // row_bytes)
+            # Cut off partial or unmatched trailing rows so appends stay aligned
+            os.truncate(self._file("keys.bin"), rows * KEY_BYTES)
+            os.truncate(self._file("vectors.bin"), rows * row_bytes)
+            self._vectors = self._map(rows)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable embedding cache at {self.path}: {e}")
+            self.dim = None
+            return
+
+        keys = keys[:rows * KEY_BYTES].reshape(rows, KEY_BYTES)
+        self._rows = {key.tobytes(): row for row, key in enumerate(keys)}
+        logger.info(f"Loaded {rows} cached embeddings for {self.model_name}")
+
+    def _map(self, rows: int) -> np.ndarray:
+        if not rows:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self._file("vectors.bin"), dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def lookup(self, texts: List[str], record_stats: bool = True) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, or None for misses"""
+        with self._lock:
+            found = []
+            for text in texts:
+                row = self._rows.get(cache_key(self.model_name, text))
+                found.append(None if row is None else np.array(self._vectors[row]))
+            if record_stats:
+                hits = sum(vector is not None for vector in found)
+                self.hits += hits
+                self.misses += len(texts) - hits
+            return found
+
+    def store(self, texts: List[str], vectors: List[List[float]]):
+        """Append vectors for texts that are not cached yet"""
+        if not texts:
+            return
+        array = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = array.shape[1]
+                os.makedirs(self.path, exist_ok=True)
+                with open(self._file("meta.json"), "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+
+            new_keys, new_rows = {}, []
+            for text, vector in zip(texts, array):
+                key = cache_key(self.model_name, text)
+                if key in self._rows or key in new_keys:
+                    continue
+                new_keys[key] = len(self._rows) + len(new_rows)
+                new_rows.append(vector)
+            if not new_rows:
+                return
+
+            new_rows = np.stack(new_rows)
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(new_rows.tobytes())
+            with open(self._file("keys.bin"), "ab") as f:
+                f.write(b"".join(new_keys))
+
+            self._rows.update(new_keys)
+            self._vectors = self._map(len(self._rows))
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self),
+            "mapped_mb": round(self._vectors.nbytes / (1024 * 1024), 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def evict_models(cache_dir: str, keep_models: List[str]) -> List[str]:
+    """Delete cached embeddings of every model not in keep_models; returns evicted directories"""
+    if not os.path.isdir(cache_dir):
+        return []
+    keep = {model_dir_name(name) for name in keep_models}
+    evicted = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+            evicted.append(name)
+    if evicted:
+        logger.info(f"Evicted embedding caches for unused models: {', '.join(evicted)}")
+    return evicted
+
+
+# ============================================================================
+# QUERY EMBEDDING CACHE
+# ============================================================================
+#
+# Popular questions are asked over and over, and each search would encode
+# them again. Query vectors are kept in a bounded in-memory LRU keyed by
+# normalized query text. Normalization only folds Unicode forms and
+# whitespace; case is kept because cased models embed "Apple" and "apple"
+# differently. The normalized text is what gets encoded, so a cached vector
+# is exactly what a miss would have produced.
+#
+# A cache belongs to one embedding model and is held by that model's
+# CachedEmbeddings, which is published together with the index built from
+# it. Changing the model therefore replaces the cache along with the index,
+# and queries never mix one model's vectors with another's index.
+# Concurrent misses on the same query may both encode it; the lock only
+# guards the dictionary, never the encoder.
+
+QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "2048"))  # 0 disables
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of query vectors of one embedding model"""
+
+    def __init__(self, model_name: str, max_entries: int = QUERY_CACHE_SIZE):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._vectors.get(text)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._vectors.move_to_end(text)
+            self.hits += 1
+            return vector
+
+    def put(self, text: str, vector: List[float]):
+        if self.max_entries <= 0:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            self._vectors[text] = vector
+            self._vectors.move_to_end(text)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "entries": len(self._vectors),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only encodes documents missing from the cache.
+
+    Queries are looked up in query_cache, if given, before being encoded.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache,
+                 query_cache: Optional[QueryEmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.query_cache = query_cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.cache.lookup(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            # Encode each distinct missing text once
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = self.embeddings.embed_documents(unique_texts)
+            self.cache.store(unique_texts, encoded)
+            by_text = dict(zip(unique_texts, encoded))
+            for i in missing:
+                cached[i] = by_text[texts[i]]
+        logger.info(f"Embedded {len(texts)} chunks ({len(texts) - len(missing)} from cache)")
+        return np.asarray(cached, dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.query_cache is None:
+            return self.embeddings.embed_query(text)
+        text = normalize_query(text)
+        vector = self.query_cache.get(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.query_cache.put(text, vector)
+            return vector
+        return vector.tolist()
@@ -0,0 +1,142 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# POLLING FOLDER WATCHER
+# ============================================================================
+#
+# Corpus directories are re-listed every poll interval and each PDF's
+# (size, mtime) is compared with the previous scan. Polling needs no
+# platform-specific notification API and also works on network mounts.
+#
+# A file is only reported once its signature has stayed the same for the
+# debounce period, so files still being written (chunked uploads, copies)
+# and bursts of changes are delivered as one batch. Hidden files such as
+# staged replacements (".name.pdf.replace") are ignored.
+
+WATCH_INTERVAL = float(os.getenv("RAG_WATCH_INTERVAL", "2.0"))  # Seconds between scans
+WATCH_DEBOUNCE = float(os.getenv("RAG_WATCH_DEBOUNCE", "1.0"))  # Quiet period before a change is reported
+
+MAX_BATCH_DELAY = 30.0  # Longest a settled change waits for the rest of its burst
+
+FileSignature = Tuple[int, int]  # (size, mtime_ns)
+
+
+def scan_pdfs(directories: List[str]) -> Dict[str, FileSignature]:
+    """Signatures of the visible PDFs in the given directories, keyed by path"""
+    found = {}
+    for directory in directories:
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.name.lower().endswith(".pdf"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed between listing and stat
+            if entry.is_file():
+                found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+class FolderWatcher:
+    """Polls corpus directories and reports settled changes in batches.
+
+    ``on_changes(changed, removed)`` receives the paths of added or modified
+    PDFs and of removed PDFs. It runs on the watcher thread and should only
+    hand the work off (e.g. enqueue an ingestion job).
+    """
+
+    def __init__(self, directories: List[str], on_changes: Callable[[List[str], List[str]], None],
+                 interval: float = WATCH_INTERVAL, debounce: float = WATCH_DEBOUNCE):
+        self.directories = list(directories)
+        self.on_changes = on_changes
+        self.interval = interval
+        self.debounce = debounce
+        self.known: Dict[str, FileSignature] = {}
+        self.scans = 0
+        self.batches = 0
+        self._pending: Dict[str, Tuple[Optional[FileSignature], float]] = {}  # path -> (signature, last changed)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def prime(self):
+        """Take the current folder contents as the baseline without reporting them"""
+        self.known = scan_pdfs(self.directories)
+
+    def poll(self, now: float) -> Tuple[List[str], List[str]]:
+        """Scan once; return the changes that have settled for the debounce period"""
+        current = scan_pdfs(self.directories)
+        self.scans += 1
+
+        for path in set(current) | set(self.known) | set(self._pending):
+            signature = current.get(path)
+            if signature == self.known.get(path):
+                self._pending.pop(path, None)  # Changed back, or unchanged
+            elif path not in self._pending or self._pending[path][0] != signature:
+                self._pending[path] = (signature, now)  # New or still changing: restart the quiet period
+
+        settled = [path for path, (_, seen) in self._pending.items() if now - seen >= self.debounce]
+        if not settled:
+            return [], []
+        # Hold settled files back while others are still changing, so a burst
+        # arrives as one batch, but not longer than MAX_BATCH_DELAY
+        oldest = min(seen for _, seen in self._pending.values())
+        if len(settled) < len(self._pending) and now - oldest < MAX_BATCH_DELAY:
+            return [], []
+
+        changed, removed = [], []
+        for path in settled:
+            signature, _ = self._pending.pop(path)
+            if signature is None:
+                self.known.pop(path, None)
+                removed.append(path)
+            else:
+                self.known[path] = signature
+                changed.append(path)
+        return sorted(changed), sorted(removed)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                changed, removed = self.poll(time.monotonic())
+                if changed or removed:
+                    self.batches += 1
+                    logger.info(f"Folder watcher: {len(changed)} changed, {len(removed)} removed PDF(s)")
+                    self.on_changes(changed, removed)
+            except Exception as e:
+                logger.error(f"Folder watcher poll failed: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {', '.join(self.directories)} every {self.interval}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "directories": self.directories,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval_seconds": self.interval,
+            "debounce_seconds": self.debounce,
+            "files": len(self.known),
+            "pending_changes": len(self._pending),
+            "scans": self.scans,
+            "batches": self.batches,
+        }
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from keyword_fts import FTSKeywordIndex
+from rag_index import RAGIndex
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# ON-DISK INDEX SNAPSHOT
+# ============================================================================
+#
+# A snapshot directory holds everything needed to serve queries without
+# re-embedding the corpus:
+#
+#   index.faiss / index.pkl   FAISS index (appended vectors folded in) and
+#                             chunk store (FAISS.save_local format)
+#   keyword_index.pkl         BM25 postings (or, with the fts5 backend, a
+#                             handle on its SQLite database), the TF-IDF
+#                             vectorizer and near-duplicate signatures
+#   manifest.json             snapshot version, source file hashes and
+#                             ingestion IDs, chunk counts, chunking
+#                             parameters, embedding model,
+#                             vector index settings and what was built,
+#                             keyword backend, near-duplicate mappings and
+#                             tombstoned chunk IDs
+#
+# The manifest is written last, so a half-written snapshot never validates.
+
+SNAPSHOT_VERSION = 12
+MANIFEST_FILE = "manifest.json"
+KEYWORD_INDEX_FILE = "keyword_index.pkl"
+
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """Hash a file's content in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_manifest(pdf_files: List[str], embedding_model: str, chunk_settings: Dict[str, Any],
+                   vector_index: Dict[str, Any], keyword_backend: str = "memory",
+                   hash_file: Callable[[str], str] = file_sha256) -> Dict[str, Any]:
+    """Describe the corpus and parameters an index was (or would be) built from"""
+    return {
+        "snapshot_version": SNAPSHOT_VERSION,
+        "embedding_model": embedding_model,
+        "chunking": dict(chunk_settings),
+        "vector_index": dict(vector_index),
+        "keyword_backend": keyword_backend,
+        "files": {os.path.basename(path): hash_file(path) for path in sorted(pdf_files)},
+    }
+
+
+def manifest_matches(stored: Dict[str, Any], expected: Dict[str, Any]) -> bool:
+    """Check whether a stored manifest was built from the expected corpus"""
+    keys = ("snapshot_version", "embedding_model", "chunking", "vector_index", "keyword_backend", "files")
+    return all(stored.get(key) == expected.get(key) for key in keys)
+
+
+def read_manifest(snapshot_dir: str) -> Optional[Dict[str, Any]]:
+    """Read a snapshot manifest, or None if there is no usable one"""
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable snapshot manifest {manifest_path}: {e}")
+        return None
+
+
+def save_snapshot(snapshot_dir: str, index: RAGIndex):
+    """Write a snapshot to a staging directory and swap it into place"""
+    parent = os.path.dirname(os.path.abspath(snapshot_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging_dir = f"{snapshot_dir}.tmp-{os.getpid()}"
+    backup_dir = f"{snapshot_dir}.old-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    index.merged_vector_store().save_local(staging_dir)
+    with open(os.path.join(staging_dir, KEYWORD_INDEX_FILE), "wb") as f:
+        pickle.dump({
+            "bm25_index": index.bm25_index,
+            "tfidf_vectorizer": index.tfidf_vectorizer,
+            "near_duplicates": index.near_duplicates,
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    manifest = dict(index.manifest, created_at=datetime.now().isoformat(), tombstones=sorted(index.tombstones))
+    with open(os.path.join(staging_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(snapshot_dir):
+        os.replace(snapshot_dir, backup_dir)
+    os.replace(staging_dir, snapshot_dir)
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    logger.info(f"Saved index snapshot to {snapshot_dir} ({manifest.get('num_chunks', 0)} chunks)")
+
+
+def load_snapshot(snapshot_dir: str, embeddings, expected_manifest: Dict[str, Any]) -> Optional[RAGIndex]:
+    """Load a snapshot if its manifest matches the expected corpus, otherwise None"""
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        logger.info(f"No index snapshot found in {snapshot_dir}")
+        return None
+    if not manifest_matches(manifest, expected_manifest):
+        logger.info("Index snapshot is stale (corpus or parameters changed)")
+        return None
+
+    from langchain_community.vectorstores import FAISS
+
+    try:
+        # The snapshot is produced by this service, so its pickles are trusted
+        vector_store = FAISS.load_local(snapshot_dir, embeddings, allow_dangerous_deserialization=True)
+        with open(os.path.join(snapshot_dir, KEYWORD_INDEX_FILE), "rb") as f:
+            keyword_state = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Failed to load index snapshot from {snapshot_dir}: {e}")
+        return None
+    bm25_index = keyword_state.get("bm25_index")
+    if isinstance(bm25_index, FTSKeywordIndex) and not bm25_index.exists():
+        logger.warning(f"Keyword database {bm25_index.path} of the index snapshot is missing")
+        return None
+
+    return RAGIndex(
+        vector_store=vector_store,
+        bm25_index=bm25_index,
+        tfidf_vectorizer=keyword_state.get("tfidf_vectorizer"),
+        manifest=manifest,
+        tombstones=frozenset(manifest.pop("tombstones", [])),
+        near_duplicates=keyword_state.get("near_duplicates"),
+    )
@@ -0,0 +1,137 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# BACKGROUND INGESTION JOBS
+# ============================================================================
+#
+# Ingestion runs on a single worker thread, so index writers are serialized
+# and HTTP handlers only enqueue work. Jobs report progress through the
+# IngestionJob they are handed; per-file problems go to job.errors while an
+# exception fails the whole job. Finished jobs are kept for inspection until
+# MAX_FINISHED_JOBS newer ones have completed. An after_job hook runs on the
+# worker after every job, told whether the queue has gone idle, for work
+# worth batching across jobs (such as saving the index snapshot).
+
+MAX_FINISHED_JOBS = 200
+
+
+@dataclass
+class IngestionJob:
+    """Progress and outcome of one ingestion request"""
+    job_id: str
+    kind: str
+    files: List[str]
+    status: str = "queued"  # queued, running, succeeded, failed
+    stage: str = ""  # Current step of a multi-step job, e.g. "embedding"
+    files_done: int = 0
+    pages_done: int = 0
+    chunks_indexed: int = 0
+    errors: List[str] = field(default_factory=list)
+    result: Dict[str, Any] = field(default_factory=dict)
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    _started: float = field(default=0.0, repr=False)
+    _elapsed: Optional[float] = field(default=None, repr=False)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        if self._elapsed is not None:
+            return self._elapsed
+        return time.perf_counter() - self._started if self._started else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed_seconds
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "files": self.files,
+            "progress": {
+                "stage": self.stage,
+                "files_done": self.files_done,
+                "files_total": len(self.files),
+                "pages_done": self.pages_done,
+                "chunks_indexed": self.chunks_indexed,
+            },
+            "throughput": {
+                "elapsed_seconds": round(elapsed, 3),
+                "pages_per_second": round(self.pages_done / elapsed, 2) if elapsed else 0.0,
+                "chunks_per_second": round(self.chunks_indexed / elapsed, 2) if elapsed else 0.0,
+            },
+            "errors": self.errors,
+            "result": self.result,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class IngestionQueue:
+    """FIFO of ingestion jobs processed by one background thread"""
+
+    def __init__(self, after_job: Optional[Callable[[IngestionJob, bool], None]] = None):
+        self.jobs: Dict[str, IngestionJob] = {}
+        self.after_job = after_job
+        self._finished: List[str] = []
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def submit(self, kind: str, files: List[str], task: Callable[[IngestionJob], Dict[str, Any]]) -> IngestionJob:
+        """Enqueue task(job); its return value becomes the job result"""
+        job = IngestionJob(job_id=uuid.uuid4().hex, kind=kind, files=list(files))
+        with self._lock:
+            self.jobs[job.job_id] = job
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="ingestion-worker", daemon=True)
+                self._worker.start()
+        self._queue.put((job, task))
+        logger.info(f"Queued {kind} job {job.job_id} for {len(files)} file(s)")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            job, task = self._queue.get()
+            job.status = "running"
+            job.started_at = datetime.now()
+            job._started = time.perf_counter()
+            try:
+                job.result = task(job) or {}
+                job.status = "succeeded"
+            except Exception as e:
+                logger.error(f"Ingestion job {job.job_id} failed: {e}")
+                job.errors.append(str(e))
+                job.status = "failed"
+            finally:
+                job._elapsed = time.perf_counter() - job._started
+                job.finished_at = datetime.now()
+                self._retire(job)
+                self._queue.task_done()
+            logger.info(f"Ingestion job {job.job_id} {job.status} in {job._elapsed:.2f}s")
+            if self.after_job is not None:
+                try:
+                    self.after_job(job, self._queue.empty())
+                except Exception as e:
+                    logger.error(f"After-job hook failed for {job.job_id}: {e}")
+
+    def _retire(self, job: IngestionJob):
+        with self._lock:
+            self._finished.append(job.job_id)
+            while len(self._finished) > MAX_FINISHED_JOBS:
+                self.jobs.pop(self._finished.pop(0), None)
@@ -0,0 +1,238 @@
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# SQLITE FTS5 KEYWORD INDEX
+# ============================================================================
+#
+# Alternative to the in-memory IncrementalBM25 (RAG_KEYWORD_BACKEND=fts5):
+# postings live in a SQLite FTS5 table on disk, keyed by chunk key (the FTS
+# rowid), and results are resolved through the chunk store like those of
+# the other indexes. Nothing proportional to the corpus is held in RAM by
+# this index or rebuilt at startup; the snapshot only pickles a handle
+# naming the database file and the part of it the index sees.
+#
+# The database is shared: ingestion appends to it and every thread (or
+# worker process) reads it through its own read-only connection, with WAL
+# journaling so readers never block the writer. Copy-on-write holds for
+# the RAGIndex bundles through a watermark: rows are only ever appended,
+# chunk keys only grow, and a handle sees rows up to the highest key it
+# wrote. Rows of a derived index that was never published are above every
+# published watermark; the next writer drops them. Removal (compaction)
+# copies the rows that remain into a new database file, so bundles still
+# reading the old file keep every row they had.
+#
+# FTS5's own bm25() takes its statistics from the whole table, which would
+# count tombstoned rows and rows newer bundles appended. Queries are
+# therefore scored here with the same formula, from the term postings
+# (FTS5's fts5vocab "instance" table) of rows up to the watermark, with
+# document count and total length kept in the handle and tombstoned chunks
+# left out of the statistics as well as the results.
+#
+# Writers are serialized by the caller (main.index_lock). A full rebuild
+# or a compaction creates a new database file, so it never disturbs readers
+# of the previous one; evict_databases() removes superseded files.
+
+DATABASE_PREFIX = "keywords-"
+DATABASE_SUFFIX = ".sqlite"
+BM25_K1 = 1.2  # FTS5 bm25() parameters
+BM25_B = 0.75
+MIN_IDF = 1e-6  # FTS5 floors the IDF of terms in more than half of the rows here
+
+# unicode61 (without diacritic removal) splits on whitespace and punctuation, underscore included
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_readers = threading.local()  # Per-thread read-only connections by database path
+
+
+def tokenize(text: str) -> List[str]:
+    """Approximation of the FTS5 unicode61 tokenizer, for query terms and document lengths"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _reader(path: str) -> sqlite3.Connection:
+    connections: Dict[str, sqlite3.Connection] = getattr(_readers, "connections", None)
+    if connections is None:
+        connections = _readers.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        # A thread serves one index at a time; connections to superseded files are closed
+        for stale in connections.values():
+            stale.close()
+        connections.clear()
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        connections[path] = connection
+    return connection
+
+
+def _new_database(directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.abspath(os.path.join(directory, f"{DATABASE_PREFIX}{uuid.uuid4().hex[:12]}{DATABASE_SUFFIX}"))
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE VIRTUAL TABLE chunks USING fts5(text, tokenize='unicode61 remove_diacritics 0')")
+        connection.execute("CREATE VIRTUAL TABLE terms USING fts5vocab(chunks, instance)")
+        connection.execute("CREATE TABLE lengths (rowid INTEGER PRIMARY KEY, length INTEGER NOT NULL)")
+        connection.commit()
+    finally:
+        connection.close()
+    return path
+
+
+class FTSExclusion:
+    """Tombstoned chunk keys of one bundle; their share of the statistics is looked up on first use"""
+
+    def __init__(self, index: "FTSKeywordIndex", keys: Iterable[int]):
+        self.keys = np.unique(np.fromiter(keys, dtype=np.int64))
+        self._index = index
+        self._totals: Optional[Tuple[int, int]] = None
+
+    def totals(self) -> Tuple[int, int]:
+        """(Number, total length) of the excluded rows the index sees"""
+        if self._totals is None:
+            rows = _reader(self._index.path).execute(
+                "SELECT count(*), total(length) FROM lengths WHERE rowid IN (SELECT value FROM json_each(?)) "
+                "AND rowid <= ?", (json.dumps(self.keys.tolist()), self._index.watermark)
+            ).fetchone()
+            self._totals = (int(rows[0]), int(rows[1]))
+        return self._totals
+
+
+class FTSKeywordIndex:
+    """Handle on a SQLite FTS5 keyword index, with the IncrementalBM25 update interface"""
+
+    def __init__(self, path: str, watermark: int = 0, num_docs: int = 0, total_length: int = 0):
+        self.path = path
+        self.watermark = watermark  # Highest chunk key (rowid) this index sees
+        self.num_docs = num_docs  # Rows up to the watermark
+        self.total_length = total_length  # Their tokens
+
+    @classmethod
+    def create(cls, directory: str) -> "FTSKeywordIndex":
+        """Empty index in a new database file"""
+        return cls(_new_database(directory))
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def add_documents(self, texts: List[str], keys: List[int]):
+        """Append documents under their chunk keys; rows above the watermark are leftovers of unpublished updates"""
+        lengths = [len(tokenize(text)) for text in texts]
+        keys = [int(key) for key in keys]
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                connection.execute("DELETE FROM chunks WHERE rowid > ?", (self.watermark,))
+                connection.execute("DELETE FROM lengths WHERE rowid > ?", (self.watermark,))
+                connection.executemany("INSERT INTO chunks (rowid, text) VALUES (?, ?)", zip(keys, texts))
+                connection.executemany("INSERT INTO lengths (rowid, length) VALUES (?, ?)", zip(keys, lengths))
+        finally:
+            connection.close()
+        self.watermark = max([self.watermark] + keys)
+        self.num_docs += len(keys)
+        self.total_length += sum(lengths)
+
+    def copy(self) -> "FTSKeywordIndex":
+        """Handle that can be extended without changing what this one sees"""
+        return FTSKeywordIndex(self.path, self.watermark, self.num_docs, self.total_length)
+
+    def without(self, removed_keys: Iterable[int]) -> "FTSKeywordIndex":
+        """Index over a new database file holding this one's rows except the given chunk keys"""
+        path = _new_database(os.path.dirname(self.path))
+        removed = json.dumps(sorted({int(key) for key in removed_keys}))
+        connection = sqlite3.connect(path)
+        try:
+            connection.execute("ATTACH DATABASE ? AS source", (f"file:{self.path}?mode=ro",))
+            with connection:
+                for table, columns in (("chunks", "rowid, text"), ("lengths", "rowid, length")):
+                    connection.execute(
+                        f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM source.{table} "
+                        f"WHERE rowid <= ? AND rowid NOT IN (SELECT value FROM json_each(?)) ORDER BY rowid",
+                        (self.watermark, removed)
+                    )
+                num_docs, total_length = connection.execute("SELECT count(*), total(length) FROM lengths").fetchone()
+            connection.execute("DETACH DATABASE source")
+        finally:
+            connection.close()
+        return FTSKeywordIndex(path, self.watermark, int(num_docs), int(total_length))
+
+    def exclusion(self, keys: Iterable[int]) -> FTSExclusion:
+        return FTSExclusion(self, keys)
+
+    def _postings(self, connection: sqlite3.Connection, term: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(chunk keys, term frequencies, document lengths) of the visible rows containing a term"""
+        rows = connection.execute(
+            "SELECT terms.doc, count(*), lengths.length FROM terms JOIN lengths ON lengths.rowid = terms.doc "
+            "WHERE terms.term = ? AND terms.doc <= ? GROUP BY terms.doc",
+            (term, self.watermark)
+        ).fetchall()
+        postings = np.asarray(rows, dtype=np.int64).reshape(-1, 3)
+        return postings[:, 0], postings[:, 1].astype(np.float64), postings[:, 2].astype(np.float64)
+
+    def search(self, query: str, k: int, excluded: Optional[FTSExclusion] = None) -> List[Tuple[int, float]]:
+        """Best k (chunk key, score), best first; scores are FTS5 bm25() values, negated so higher is better"""
+        terms = Counter(tokenize(query))
+        if k <= 0 or not terms:
+            return []
+        num_docs, total_length = self.num_docs, self.total_length
+        if excluded is not None:
+            excluded_docs, excluded_length = excluded.totals()
+            num_docs, total_length = num_docs - excluded_docs, total_length - excluded_length
+        if num_docs <= 0:
+            return []
+        avgdl = total_length / num_docs or 1.0
+
+        connection = _reader(self.path)
+        keys, partial = [], []
+        for term, repeats in terms.items():
+            term_keys, tf, length = self._postings(connection, term)
+            if excluded is not None and len(excluded.keys):
+                live = ~np.isin(term_keys, excluded.keys, assume_unique=True)
+                term_keys, tf, length = term_keys[live], tf[live], length[live]
+            if not len(term_keys):
+                continue
+            df = len(term_keys)
+            idf = max(math.log((num_docs - df + 0.5) / (df + 0.5)), MIN_IDF)
+            keys.append(term_keys)
+            partial.append(repeats * idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl)))
+        if not keys:
+            return []
+        unique_keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(partial))
+        n = min(k, len(scores))
+        top = np.argpartition(scores, -n)[-n:] if n < len(scores) else np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(unique_keys[i]), float(scores[i])) for i in top]
+
+
+def evict_databases(directory: str, keep: Collection[str]) -> List[str]:
+    """Delete keyword databases in directory other than the paths in keep"""
+    if not os.path.isdir(directory):
+        return []
+    keep = {os.path.abspath(path) for path in keep}
+    removed = []
+    for name in os.listdir(directory):
+        path = os.path.abspath(os.path.join(directory, name))
+        base = name.split(DATABASE_SUFFIX)[0] + DATABASE_SUFFIX
+        if not name.startswith(DATABASE_PREFIX) or os.path.join(os.path.dirname(path), base) in keep:
+            continue
+        try:
+            os.remove(path)
+            removed.append(name)
+        except OSError as e:
+            logger.warning(f"Could not remove keyword database {path}: {e}")
+    if removed:
+        logger.info(f"Removed {len(removed)} superseded keyword database files")
+    return removed
@@ -0,0 +1,313 @@
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from chunk_store import key_positions
+
+# ============================================================================
+# INCREMENTAL BM25 KEYWORD INDEX
+# ============================================================================
+#
+# Term frequencies are kept as an inverted index: for each term, the
+# positions of the documents containing it and how often it occurs there.
+# A query only touches the postings of its own terms; the per-document
+# contributions are summed with NumPy and the top k picked with
+# argpartition, so nothing proportional to the corpus runs in Python.
+#
+# Postings live in immutable segments (CSR arrays: term row -> positions,
+# frequencies). Appending documents adds a small segment, and copies share
+# the existing ones, so the copy-on-write index updates stay cheap. The
+# newest segment is merged into the one before it while that one holds no
+# more documents, as in a binary counter: segment sizes at least double
+# from newest to oldest, and a document is re-merged O(log n) times rather
+# than with the whole corpus every few appends. More than MAX_SEGMENTS
+# segments are merged into one.
+#
+# Documents are chunks of the chunk store: the index keeps their keys, not
+# their text, and search returns (key, score) pairs.
+
+MAX_SEGMENTS = 8
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenizer shared by indexing and querying"""
+    return text.lower().split()
+
+
+class PostingsSegment:
+    """Immutable postings of a run of documents, in CSR form over its own terms"""
+
+    def __init__(self, rows: Dict[str, int], indptr: np.ndarray, positions: np.ndarray, frequencies: np.ndarray,
+                 num_docs: int = 0):
+        self.rows = rows  # term -> row
+        self.indptr = indptr
+        self.positions = positions  # Corpus-wide document positions, ascending within a row
+        self.frequencies = frequencies
+        self.num_docs = num_docs
+
+    @classmethod
+    def from_counts(cls, counts: List[Dict[str, int]], start: int) -> "PostingsSegment":
+        """Segment of documents start, start + 1, ... given their term counts"""
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for offset, frequencies in enumerate(counts):
+            for term, tf in frequencies.items():
+                entry = postings.setdefault(term, ([], []))
+                entry[0].append(start + offset)
+                entry[1].append(tf)
+        return cls.from_postings({term: (np.asarray(p, dtype=np.int64), np.asarray(f, dtype=np.float32))
+                                  for term, (p, f) in postings.items()}, len(counts))
+
+    @classmethod
+    def from_postings(cls, postings: Dict[str, Tuple[np.ndarray, np.ndarray]], num_docs: int) -> "PostingsSegment":
+        rows = {term: row for row, term in enumerate(postings)}
+        lengths = np.fromiter((len(p) for p, _ in postings.values()), dtype=np.int64, count=len(postings))
+        indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        if postings:
+            positions = np.concatenate([p for p, _ in postings.values()])
+            frequencies = np.concatenate([f for _, f in postings.values()])
+        else:
+            positions, frequencies = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return cls(rows, indptr, positions, frequencies, num_docs)
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        row = self.rows.get(term)
+        if row is None:
+            return None
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.positions[start:end], self.frequencies[start:end]
+
+    def items(self) -> Iterable[Tuple[str, np.ndarray, np.ndarray]]:
+        for term, row in self.rows.items():
+            start, end = self.indptr[row], self.indptr[row + 1]
+            yield term, self.positions[start:end], self.frequencies[start:end]
+
+
+def merge_segments(segments: List[PostingsSegment], new_positions: Optional[np.ndarray] = None) -> PostingsSegment:
+    """One segment holding the postings of several, optionally renumbering positions.
+
+    new_positions maps old position -> new position, or -1 to drop the document;
+    it is only given when merging every segment. Postings are regrouped by
+    term with one stable sort, so only the term lookup runs per term in Python.
+    """
+    rows: Dict[str, int] = {}
+    row_ids, positions, frequencies = [], [], []
+    for segment in segments:
+        mapping = np.empty(len(segment.rows), dtype=np.int64)
+        mapping[np.fromiter(segment.rows.values(), dtype=np.int64, count=len(segment.rows))] = np.fromiter(
+            (rows.setdefault(term, len(rows)) for term in segment.rows), dtype=np.int64, count=len(segment.rows))
+        row_ids.append(np.repeat(mapping, np.diff(segment.indptr)))
+        positions.append(segment.positions)
+        frequencies.append(segment.frequencies)
+    row_ids = np.concatenate(row_ids) if row_ids else np.zeros(0, dtype=np.int64)
+    positions = np.concatenate(positions) if positions else np.zeros(0, dtype=np.int64)
+    frequencies = np.concatenate(frequencies) if frequencies else np.zeros(0, dtype=np.float32)
+    if new_positions is not None:
+        positions = new_positions[positions]
+        kept = positions >= 0
+        row_ids, positions, frequencies = row_ids[kept], positions[kept], frequencies[kept]
+
+    # Earlier segments hold earlier positions, so a stable sort keeps each row ascending
+    order = np.argsort(row_ids, kind="stable")
+    counts = np.bincount(row_ids, minlength=len(rows))
+    if not counts.all():
+        # Drop terms whose documents were all removed
+        nonempty = counts > 0
+        terms = list(rows)
+        rows = {terms[row]: new_row for new_row, row in enumerate(np.flatnonzero(nonempty).tolist())}
+        counts = counts[nonempty]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    num_docs = sum(segment.num_docs for segment in segments) if new_positions is None else int((new_positions >= 0).sum())
+    return PostingsSegment(rows, indptr, positions[order], frequencies[order], num_docs)
+
+
+@dataclass
+class KeywordHit:
+    """A keyword search result: the chunk's text and metadata, with its key, stable ID and BM25 score"""
+    key: int
+    chunk_id: str
+    score: float
+    page_content: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class IncrementalBM25:
+    """BM25 (Okapi) index that can grow in place.
+
+    Scores match ``rank_bm25.BM25Okapi``; unlike it, documents can be appended
+    without re-tokenizing the existing corpus. Corpus statistics (document
+    frequencies, lengths) are maintained incrementally and IDF values are
+    derived on demand.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.keys = np.zeros(0, dtype=np.int64)  # Chunk key of each document, ascending
+        self.segments: List[PostingsSegment] = []
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.df: Dict[str, int] = {}
+        self.total_len = 0
+        self._average_idf: Optional[float] = None
+        self._weights: Dict[int, np.ndarray] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The weight cache is keyed by object identity, which does not survive pickling
+        state = dict(self.__dict__)
+        state["_weights"] = {}
+        return state
+
+    @property
+    def corpus_size(self) -> int:
+        return len(self.doc_len)
+
+    @property
+    def avgdl(self) -> float:
+        return self.total_len / self.corpus_size if self.corpus_size else 0.0
+
+    def add_documents(self, texts: List[str], keys: List[int]):
+        """Tokenize and append documents, updating corpus statistics"""
+        counts = [Counter(tokenize(text)) for text in texts]
+        lengths = [sum(frequencies.values()) for frequencies in counts]
+        segment = PostingsSegment.from_counts(counts, self.corpus_size)
+        for term, positions, _ in segment.items():
+            self.df[term] = self.df.get(term, 0) + len(positions)
+        self.keys = np.concatenate([self.keys, np.asarray(keys, dtype=np.int64)])
+        self.doc_len = np.concatenate([self.doc_len, np.asarray(lengths, dtype=np.float32)])
+        self.total_len += sum(lengths)
+        segments = self.segments + [segment]
+        while len(segments) > 1 and segments[-2].num_docs <= segments[-1].num_docs:
+            segments = segments[:-2] + [merge_segments(segments[-2:])]
+        if len(segments) > MAX_SEGMENTS:
+            segments = [merge_segments(segments)]
+        self.segments = segments
+        self._average_idf = None
+        self._weights = {}
+
+    def copy(self) -> "IncrementalBM25":
+        """Independent copy that can be extended without affecting this index"""
+        clone = IncrementalBM25(self.k1, self.b, self.epsilon)
+        # Segments, keys and doc_len are never modified in place, so they are shared
+        clone.keys = self.keys
+        clone.segments = list(self.segments)
+        clone.doc_len = self.doc_len
+        clone.df = dict(self.df)
+        clone.total_len = self.total_len
+        clone._average_idf = self._average_idf
+        return clone
+
+    def without(self, removed_keys: Iterable[int]) -> "IncrementalBM25":
+        """Copy without the given chunk keys, reusing stored postings"""
+        keep = np.ones(self.corpus_size, dtype=bool)
+        keep[key_positions(self.keys, removed_keys)] = False
+        new_positions = np.where(keep, np.cumsum(keep) - 1, -1)
+        clone = IncrementalBM25(self.k1, self.b, self.epsilon)
+        clone.keys = self.keys[keep]
+        clone.doc_len = self.doc_len[keep]
+        clone.total_len = int(clone.doc_len.sum())
+        segment = merge_segments(self.segments, new_positions)
+        clone.segments = [segment]
+        clone.df = {term: len(positions) for term, positions, _ in segment.items()}
+        return clone
+
+    def exclusion(self, keys: Iterable[int]) -> np.ndarray:
+        """Boolean mask over positions, set for the given chunk keys"""
+        mask = np.zeros(self.corpus_size, dtype=bool)
+        mask[key_positions(self.keys, keys)] = True
+        return mask
+
+    def _raw_idf(self, term: str) -> float:
+        df = self.df.get(term, 0)
+        return math.log(self.corpus_size - df + 0.5) - math.log(df + 0.5)
+
+    def _idf(self, term: str) -> float:
+        if self._average_idf is None:
+            idf_sum = sum(self._raw_idf(t) for t in self.df)
+            self._average_idf = idf_sum / len(self.df) if self.df else 0.0
+        idf = self._raw_idf(term)
+        return idf if idf >= 0 else self.epsilon * self._average_idf
+
+    def _segment_weights(self, segment: PostingsSegment) -> np.ndarray:
+        """Length-normalized term frequency part of BM25 for every posting of a segment.
+
+        It depends on the average document length, so it is cached per index
+        instance and dropped whenever documents are added.
+        """
+        weights = self._weights.get(id(segment))
+        if weights is None:
+            tf = segment.frequencies
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[segment.positions] / self.avgdl)
+            weights = tf * (self.k1 + 1) / (tf + norm)
+            self._weights[id(segment)] = weights
+        return weights
+
+    def _postings_scores(self, query_tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, partial scores) of every posting of the query terms"""
+        positions, partial = [], []
+        for term in query_tokens:
+            if term not in self.df:
+                continue
+            idf = self._idf(term)
+            for segment in self.segments:
+                row = segment.rows.get(term)
+                if row is None:
+                    continue
+                start, end = segment.indptr[row], segment.indptr[row + 1]
+                positions.append(segment.positions[start:end])
+                partial.append(idf * self._segment_weights(segment)[start:end])
+        if not positions:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        if len(positions) == 1:
+            return positions[0], partial[0]
+        return np.concatenate(positions), np.concatenate(partial)
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """BM25 score of every document for the query tokens"""
+        positions, partial = self._postings_scores(query_tokens)
+        return np.bincount(positions, weights=partial, minlength=self.corpus_size).astype(np.float64)
+
+    def top_k(self, query_tokens: List[str], k: int,
+              excluded: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Best k (position, score) pairs for the query, best first.
+
+        Only documents containing a query term are scored and returned;
+        excluded is an optional boolean mask over positions (e.g. tombstoned
+        chunks) whose documents are skipped.
+        """
+        positions, partial = self._postings_scores(query_tokens)
+        if k <= 0 or not len(positions):
+            return []
+        scores = np.bincount(positions, weights=partial, minlength=self.corpus_size)
+        if excluded is not None:
+            scores[excluded] = 0.0
+        if len(positions) > self.corpus_size:
+            # Common terms match most documents: select over the dense scores
+            candidates, n = np.arange(self.corpus_size), min(k, self.corpus_size)
+        else:
+            # Selection runs over the postings rather than the whole corpus; a
+            # run of tied zeros also makes argpartition very slow. A document
+            # appears at most once per query token, so the best
+            # k * len(query_tokens) postings cover the best k documents.
+            candidates, n = positions, min(k * len(query_tokens), len(positions))
+            scores = scores[positions]
+        top = np.argpartition(scores, -n)[-n:] if n < len(scores) else np.arange(n)
+        top = top[np.argsort(scores[top])[::-1]]
+        results, seen = [], set()
+        for i in top:
+            position = int(candidates[i])
+            if scores[i] <= 0 or position in seen:
+                continue
+            seen.add(position)
+            results.append((position, float(scores[i])))
+            if len(results) == k:
+                break
+        return results
+
+    def search(self, query: str, k: int, excluded: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Best k (chunk key, score) for a query string, best first"""
+        return [(int(self.keys[position]), score) for position, score in self.top_k(tokenize(query), k, excluded)]
@@ -0,0 +1,60 @@
+import importlib
+import subprocess
+import sys
+import time
+from types import ModuleType
+from typing import Dict, List, Tuple
+
+# ============================================================================
+# LAZY IMPORTS AND IMPORT-TIME PROFILE
+# ============================================================================
+#
+# Provider SDKs and ML libraries take seconds to import, so the service
+# imports them on first use through lazy_import(), which also records how
+# long each first import took (reported by /status).
+#
+# Running this module prints an import-time breakdown of main.py, grouped by
+# top-level package, using the interpreter's -X importtime output:
+#
+#   python lazy_imports.py [module] [top_n]
+
+IMPORT_SECONDS: Dict[str, float] = {}
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Import a module on first use and record how long that took"""
+    if name in sys.modules:
+        # import_module waits for a first import still running on another thread
+        return importlib.import_module(name)
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_SECONDS.setdefault(name, time.perf_counter() - started)
+    return module
+
+
+def import_profile(module: str = "main") -> List[Tuple[str, float]]:
+    """Cumulative import seconds per top-level package when importing a module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    totals: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # Depth 1 entries are the modules imported directly by the profiled module
+        if depth == 1:
+            package = name.strip().split(".")[0]
+            totals[package] = totals.get(package, 0.0) + int(cumulative) / 1e6
+        elif depth == 0 and name.strip() == module:
+            totals[f"{module} (total)"] = int(cumulative) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "main"
+    top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    for package, seconds in import_profile(target)[:top_n]:
+        print(f"{seconds:8.3f}s  {package}")
@@ -0,0 +1,159 @@
+import gc
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# PROCESS-WIDE MODEL REGISTRY
+# ============================================================================
+#
+# Each role (e.g. "embeddings", "reranker") holds at most one loaded model.
+# get() loads it on first use and returns the same handle afterwards, so
+# re-initializing the index never deserializes a model again. Asking for a
+# different model name under a loaded role is an error; changing the model
+# is an explicit swap(), which loads the new model before releasing the old
+# one so callers never see an empty slot. A swap can also be split in two:
+# load() returns a staged model that is not yet current, so an index can be
+# built with it while the old model keeps serving; install() then makes it
+# current and releases the old one, and discard() drops it if the build
+# fails.
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process, or 0 where it cannot be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def parameter_bytes(model: Any) -> int:
+    """Size of a model's torch parameters, looking through common wrappers"""
+    for candidate in (model, getattr(model, "model", None)):
+        parameters = getattr(candidate, "parameters", None)
+        if callable(parameters):
+            try:
+                return sum(p.numel() * p.element_size() for p in parameters())
+            except Exception:
+                return 0
+    return 0
+
+
+@dataclass
+class LoadedModel:
+    """A shared model handle and what it cost to load"""
+    role: str
+    name: str
+    model: Any
+    load_seconds: float
+    rss_delta_bytes: int
+    parameter_bytes: int
+    loaded_at: datetime = field(default_factory=datetime.now)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "load_seconds": round(self.load_seconds, 3),
+            "rss_delta_mb": round(self.rss_delta_bytes / (1024 * 1024), 1),
+            "parameter_mb": round(self.parameter_bytes / (1024 * 1024), 1),
+            "loaded_at": self.loaded_at.isoformat(),
+        }
+
+
+class ModelRegistry:
+    """Loads each model once per process and hands out the shared handle"""
+
+    def __init__(self):
+        self._models: Dict[str, LoadedModel] = {}
+        self._lock = threading.Lock()  # Loads are rare; one lock keeps them from running twice
+        self.swaps = 0
+
+    def _load(self, role: str, name: str, loader: Callable[[], Any]) -> LoadedModel:
+        logger.info(f"Loading {role} model {name}...")
+        rss_before = rss_bytes()
+        started = time.perf_counter()
+        model = loader()
+        loaded = LoadedModel(
+            role=role,
+            name=name,
+            model=model,
+            load_seconds=time.perf_counter() - started,
+            rss_delta_bytes=max(rss_bytes() - rss_before, 0),
+            parameter_bytes=parameter_bytes(model),
+        )
+        logger.info(f"Loaded {role} model {name} in {loaded.load_seconds:.2f}s")
+        return loaded
+
+    def get(self, role: str, name: str, loader: Callable[[], Any]) -> Any:
+        """Shared model for a role, loaded with loader() on first use"""
+        with self._lock:
+            loaded = self._models.get(role)
+            if loaded is None:
+                loaded = self._models[role] = self._load(role, name, loader)
+            elif loaded.name != name:
+                raise ValueError(f"{role} model {loaded.name} is loaded; use swap() to change it to {name}")
+            return loaded.model
+
+    def swap(self, role: str, name: str, loader: Callable[[], Any]) -> Any:
+        """Load a different model for a role and release the previous one"""
+        with self._lock:
+            previous = self._models.get(role)
+            if previous is not None and previous.name == name:
+                return previous.model
+        return self.install(self.load(role, name, loader))
+
+    def load(self, role: str, name: str, loader: Callable[[], Any]) -> LoadedModel:
+        """Load a model for a role without making it current; see install() and discard()"""
+        with self._lock:
+            return self._load(role, name, loader)
+
+    def install(self, loaded: LoadedModel) -> Any:
+        """Make a staged model current for its role and release the previous one"""
+        with self._lock:
+            previous = self._models.get(loaded.role)
+            self._models[loaded.role] = loaded
+            self.swaps += 1
+        if previous is not None and previous is not loaded:
+            logger.info(f"Swapped {loaded.role} model {previous.name} -> {loaded.name}")
+            self._release(previous)
+        return loaded.model
+
+    def discard(self, loaded: LoadedModel):
+        """Release a staged model that was never installed"""
+        logger.info(f"Discarding staged {loaded.role} model {loaded.name}")
+        self._release(loaded)
+
+    def current_name(self, role: str) -> Optional[str]:
+        loaded = self._models.get(role)
+        return loaded.name if loaded else None
+
+    def _release(self, loaded: LoadedModel):
+        close = getattr(loaded.model, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Error closing {loaded.role} model {loaded.name}: {e}")
+        loaded.model = None
+        gc.collect()
+
+    def close(self):
+        """Release every model, e.g. on shutdown"""
+        with self._lock:
+            models, self._models = list(self._models.values()), {}
+        for loaded in models:
+            self._release(loaded)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": {role: loaded.to_dict() for role, loaded in self._models.items()},
+            "swaps": self.swaps,
+            "process_rss_mb": round(rss_bytes() / (1024 * 1024), 1),
+        }
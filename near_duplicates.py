@@ -0,0 +1,147 @@
+import hashlib
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# ============================================================================
+# NEAR-DUPLICATE CHUNK DETECTION (SIMHASH)
+# ============================================================================
+#
+# Each chunk gets a 64-bit SimHash over its word 3-shingles. Two chunks are
+# near-duplicates when their signatures differ in at most max_distance bits.
+# Signatures are split into max_distance + 1 bands; by the pigeonhole
+# principle, near-duplicates agree exactly on at least one band, so only
+# chunks sharing a band bucket are compared.
+#
+# Uploads extend a copy of the live index, so copies share their
+# dictionaries and bucket lists, like chunk store versions: every signature
+# is numbered in the order it was added and a copy only sees the first
+# size of them. Extending a copy that is no longer the newest starts from
+# an unshared one.
+
+SIGNATURE_BITS = 64
+SHINGLE_SIZE = 3
+MIN_TOKENS = 12  # Shorter chunks are too small for a reliable signature
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of a text's word shingles, or None if the text is too short"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < MIN_TOKENS:
+        return None
+    # Shingle hashes become rows of a bit matrix; a signature bit is set when
+    # more than half of the shingles set it
+    digests = b"".join(
+        hashlib.blake2b(" ".join(tokens[i:i + SHINGLE_SIZE]).encode("utf-8"), digest_size=8).digest()
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    )
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, SIGNATURE_BITS // 8), axis=1)
+    majority = 2 * bits.sum(axis=0, dtype=np.int64) > bits.shape[0]
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+class NearDuplicateIndex:
+    """Banded lookup table of SimHash signatures of indexed chunks"""
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.num_bands = max_distance + 1
+        self.band_bits = SIGNATURE_BITS // self.num_bands
+        self.signatures: Dict[str, int] = {}
+        self.ordinals: Dict[str, int] = {}  # Chunk ID -> order added
+        self.buckets: List[Dict[int, List[str]]] = [{} for _ in range(self.num_bands)]
+        self.size = 0
+        self._written = [0]  # Signatures added to the shared dictionaries
+
+    def _bands(self, signature: int) -> Iterable[Tuple[int, int]]:
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.num_bands):
+            yield band, signature >> (band * self.band_bits) & mask
+
+    def find(self, signature: int, is_live: Callable[[str], bool] = lambda chunk_id: True) -> Optional[str]:
+        """ID of a live indexed chunk within max_distance bits, if any"""
+        for band, key in self._bands(signature):
+            for chunk_id in self.buckets[band].get(key, ()):
+                if self.ordinals[chunk_id] >= self.size:
+                    continue
+                if bin(self.signatures[chunk_id] ^ signature).count("1") <= self.max_distance and is_live(chunk_id):
+                    return chunk_id
+        return None
+
+    def add(self, chunk_id: str, signature: int):
+        if self._written[0] != self.size:
+            self._unshare()
+        self.ordinals[chunk_id] = self.size
+        self.signatures[chunk_id] = signature
+        for band, key in self._bands(signature):
+            self.buckets[band].setdefault(key, []).append(chunk_id)
+        self.size += 1
+        self._written[0] = self.size
+
+    def _items(self) -> Iterable[Tuple[str, int]]:
+        return ((chunk_id, signature) for chunk_id, signature in list(self.signatures.items())
+                if self.ordinals[chunk_id] < self.size)
+
+    def _unshare(self):
+        # A later copy has added signatures; rebuild from the ones this copy sees
+        items = list(self._items())
+        self.signatures, self.ordinals = {}, {}
+        self.buckets = [{} for _ in range(self.num_bands)]
+        self.size, self._written = 0, [0]
+        for chunk_id, signature in items:
+            self.add(chunk_id, signature)
+
+    def copy(self) -> "NearDuplicateIndex":
+        """Copy that can be extended without affecting this index"""
+        clone = NearDuplicateIndex(self.max_distance)
+        clone.signatures, clone.ordinals, clone.buckets = self.signatures, self.ordinals, self.buckets
+        clone.size, clone._written = self.size, self._written
+        return clone
+
+    def without(self, removed_ids) -> "NearDuplicateIndex":
+        """Copy without the signatures of the given chunk IDs"""
+        clone = NearDuplicateIndex(self.max_distance)
+        for chunk_id, signature in self._items():
+            if chunk_id not in removed_ids:
+                clone.add(chunk_id, signature)
+        return clone
+
+
+def merge_sources(metadata: Dict[str, Any], source: str) -> Dict[str, Any]:
+    """Metadata with source added to the chunk's list of sources"""
+    sources = metadata.get("sources") or [metadata.get("source")]
+    if source in sources:
+        return metadata
+    return dict(metadata, sources=sources + [source])
+
+
+def deduplicate(chunks: List[Any], index: NearDuplicateIndex,
+                is_live: Callable[[str], bool] = lambda chunk_id: True) -> Tuple[List[Any], Dict[str, str]]:
+    """Split chunks into representatives to index and near-duplicates to drop.
+
+    Chunks are matched against the index and against earlier chunks of the
+    same call; representatives found are added to the index. Representatives
+    within this call get the duplicates' sources merged into their metadata.
+    Returns the representatives and a {duplicate chunk ID: representative ID}
+    map. Chunks must carry a chunk_id.
+    """
+    representatives, duplicates = [], {}
+    pending = {}
+    for chunk in chunks:
+        chunk_id = chunk.metadata["chunk_id"]
+        signature = simhash(chunk.page_content)
+        if signature is not None:
+            match = index.find(signature, is_live)
+            if match is not None:
+                duplicates[chunk_id] = match
+                if match in pending:
+                    rep = pending[match]
+                    rep.metadata = merge_sources(rep.metadata, chunk.metadata["source"])
+                continue
+            index.add(chunk_id, signature)
+            pending[chunk_id] = chunk
+        representatives.append(chunk)
+    return representatives, duplicates
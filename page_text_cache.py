@@ -0,0 +1,150 @@
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# EXTRACTED PAGE TEXT CACHE
+# ============================================================================
+#
+# Parsing PDFs is the slowest ingestion step and its output only depends on
+# the file content and the extractor, not on the chunking parameters. Page
+# texts are therefore stored per (extractor version, file SHA-256):
+#
+#   <cache_dir>/<extractor version>/<sha[:2]>/<sha>.jsonl.gz
+#
+# An entry holds one JSON string per page, one page per line, so it is
+# written while the pages are extracted and read back page by page: neither
+# holds a whole document in memory. Each entry is written to a temporary
+# file and renamed into place once complete, so readers never see a
+# partial entry. Changing the extractor version (or ENTRY_FORMAT) starts a
+# fresh directory; evict_versions() removes the old ones.
+
+ENTRY_FORMAT = 2  # Part of the directory name; version 1 stored one JSON list per file
+
+
+def version_dir_name(extractor_version: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{extractor_version}.f{ENTRY_FORMAT}")
+
+
+class PageTextWriter:
+    """Writes one cache entry page by page; it appears in the cache on commit()"""
+
+    def __init__(self, entry: str):
+        self.entry = entry
+        self.temp_path = f"{entry}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        self._file = gzip.open(self.temp_path, "wt", encoding="utf-8", compresslevel=1)
+
+    def write(self, text: str):
+        if self._file is None:
+            return
+        try:
+            self._file.write(json.dumps(text) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not cache page text in {self.entry}: {e}")
+            self.abort()
+
+    def commit(self):
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+            self._file = None
+            os.replace(self.temp_path, self.entry)
+        except OSError as e:
+            logger.warning(f"Could not cache page text in {self.entry}: {e}")
+            self.abort()
+
+    def abort(self):
+        """Drop the partial entry"""
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class PageTextCache:
+    """On-disk page texts of PDFs for one extractor version, keyed by file hash"""
+
+    def __init__(self, cache_dir: str, extractor_version: str):
+        self.cache_dir = cache_dir
+        self.extractor_version = extractor_version
+        self.path = os.path.join(cache_dir, version_dir_name(extractor_version))
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, file_hash: str) -> str:
+        return os.path.join(self.path, file_hash[:2], f"{file_hash}.jsonl.gz")
+
+    def has(self, file_hash: str) -> bool:
+        """Whether the page texts of a file are cached (counted as a hit or miss)"""
+        if os.path.exists(self._entry(file_hash)):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def iter_pages(self, file_hash: str) -> Iterator[str]:
+        """Cached page texts of a file, read lazily; raises if the entry is missing or unreadable"""
+        with gzip.open(self._entry(file_hash), "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def discard(self, file_hash: str):
+        """Remove an entry (for instance one that turned out to be unreadable)"""
+        try:
+            os.remove(self._entry(file_hash))
+        except OSError:
+            pass
+
+    def writer(self, file_hash: str) -> Optional[PageTextWriter]:
+        """Writer for a new entry, or None if it cannot be created"""
+        try:
+            return PageTextWriter(self._entry(file_hash))
+        except OSError as e:
+            logger.warning(f"Could not cache page text for {file_hash[:12]}: {e}")
+            return None
+
+    def store(self, file_hash: str, pages: List[str]):
+        writer = self.writer(file_hash)
+        if writer is None:
+            return
+        for text in pages:
+            writer.write(text)
+        writer.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "extractor_version": self.extractor_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def evict_versions(cache_dir: str, keep_versions: List[str]) -> List[str]:
+    """Delete cached page texts of every extractor version not in keep_versions"""
+    if not os.path.isdir(cache_dir):
+        return []
+    keep = {version_dir_name(version) for version in keep_versions}
+    evicted = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+            evicted.append(name)
+    if evicted:
+        logger.info(f"Evicted page text caches for old extractor versions: {', '.join(evicted)}")
+    return evicted
@@ -0,0 +1,285 @@
+import importlib
+import io
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# PDF TEXT EXTRACTOR BACKENDS
+# ============================================================================
+#
+# A backend turns pages of a PDF into text. PyPDF2 is the default; the
+# others trade speed for layout fidelity (pdfplumber keeps table rows on one
+# line, PyMuPDF is the fastest) and are only imported when selected, so
+# their libraries are optional:
+#
+#   pypdf2     PyPDF2             (default)
+#   pymupdf    PyMuPDF (fitz)
+#   pdfplumber pdfplumber
+#   pdfminer   pdfminer.six
+#
+# The backend is chosen with RAG_PDF_EXTRACTOR. Its version string is part
+# of the page text cache key, so switching backends never serves text
+# produced by another one.
+#
+# Running this module benchmarks the backends, each in a fresh process:
+#
+#   python pdf_backends.py [directory] [backend ...]
+
+PDF_EXTRACTOR = os.getenv("RAG_PDF_EXTRACTOR", "pypdf2")
+BENCHMARK_DIR = os.path.join("media", "pdfs")
+
+
+class PdfBackend:
+    """Extracts the text of PDF pages with one library"""
+    name = ""
+    module = ""        # Imported on first use
+    distribution = ""  # Package whose version identifies the extractor
+    revision = 1       # Bump whenever this backend's output changes
+
+    def __init__(self):
+        self._library = None
+
+    @property
+    def library(self) -> Any:
+        if self._library is None:
+            self._library = importlib.import_module(self.module)
+        return self._library
+
+    @property
+    def version(self) -> str:
+        try:
+            library_version = metadata.version(self.distribution)
+        except metadata.PackageNotFoundError:
+            library_version = "missing"
+        return f"{self.name}-{library_version}-{self.revision}"
+
+    def available(self) -> bool:
+        try:
+            metadata.version(self.distribution)
+        except metadata.PackageNotFoundError:
+            return False
+        return True
+
+    def page_count(self, pdf_path: str) -> int:
+        raise NotImplementedError
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """Lazily yield (page_number, text) for pages [start, end); page numbers are 1-based"""
+        raise NotImplementedError
+
+
+class PyPDF2Backend(PdfBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+    distribution = "PyPDF2"
+
+    def page_count(self, pdf_path: str) -> int:
+        with open(pdf_path, 'rb') as file:
+            return len(self.library.PdfReader(file).pages)
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = self.library.PdfReader(file)
+            end = len(pdf_reader.pages) if end is None else end
+            for index in range(start, end):
+                yield index + 1, pdf_reader.pages[index].extract_text() or ""
+
+
+class PyMuPDFBackend(PdfBackend):
+    name = "pymupdf"
+    module = "fitz"
+    distribution = "PyMuPDF"
+
+    def page_count(self, pdf_path: str) -> int:
+        with self.library.open(pdf_path) as document:
+            return document.page_count
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        with self.library.open(pdf_path) as document:
+            end = document.page_count if end is None else end
+            for index in range(start, end):
+                # "sort" orders blocks top-to-bottom, left-to-right, as they read
+                yield index + 1, document.load_page(index).get_text("text", sort=True) or ""
+
+
+class PdfPlumberBackend(PdfBackend):
+    name = "pdfplumber"
+    module = "pdfplumber"
+    distribution = "pdfplumber"
+
+    def page_count(self, pdf_path: str) -> int:
+        with self.library.open(pdf_path) as pdf:
+            return len(pdf.pages)
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        with self.library.open(pdf_path) as pdf:
+            end = len(pdf.pages) if end is None else end
+            for index in range(start, end):
+                page = pdf.pages[index]
+                yield index + 1, page.extract_text() or ""
+                # Parsed layout objects are cached on the page; drop them as we go
+                page.flush_cache()
+
+
+class PdfMinerBackend(PdfBackend):
+    name = "pdfminer"
+    module = "pdfminer.high_level"
+    distribution = "pdfminer.six"
+
+    def page_count(self, pdf_path: str) -> int:
+        pdfpage = importlib.import_module("pdfminer.pdfpage")
+        with open(pdf_path, 'rb') as file:
+            return sum(1 for _ in pdfpage.PDFPage.get_pages(file))
+
+    def iter_pages(self, pdf_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        # What extract_text() does, with one parse of the file and one
+        # interpreter for the whole range; calling extract_text() per page
+        # re-parses the document each time. The converter's output is taken
+        # and cleared after every page.
+        converter = importlib.import_module("pdfminer.converter")
+        layout = importlib.import_module("pdfminer.layout")
+        pdfinterp = importlib.import_module("pdfminer.pdfinterp")
+        pdfpage = importlib.import_module("pdfminer.pdfpage")
+        output = io.StringIO()
+        resources = pdfinterp.PDFResourceManager(caching=True)
+        device = converter.TextConverter(resources, output, laparams=layout.LAParams())
+        interpreter = pdfinterp.PDFPageInterpreter(resources, device)
+        try:
+            with open(pdf_path, 'rb') as file:
+                for index, page in enumerate(pdfpage.PDFPage.get_pages(file, caching=True)):
+                    if end is not None and index >= end:
+                        break
+                    if index < start:
+                        continue
+                    interpreter.process_page(page)
+                    yield index + 1, output.getvalue()
+                    output.seek(0)
+                    output.truncate()
+        finally:
+            device.close()
+
+
+BACKENDS: Dict[str, PdfBackend] = {
+    backend.name: backend
+    for backend in (PyPDF2Backend(), PyMuPDFBackend(), PdfPlumberBackend(), PdfMinerBackend())
+}
+
+
+def get_backend(name: Optional[str] = None) -> PdfBackend:
+    """Backend registered under name (default: RAG_PDF_EXTRACTOR)"""
+    name = (name or PDF_EXTRACTOR).lower()
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown PDF extractor {name!r}; choose one of {', '.join(BACKENDS)}")
+    return backend
+
+
+# ============================================================================
+# BACKEND BENCHMARK
+# ============================================================================
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process"""
+    import resource  # Unix only; the benchmark is the only user
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+def benchmark_backend(name: str, pdf_paths: List[str]) -> Dict[str, Any]:
+    """Extract every page of the given PDFs with one backend and measure it.
+
+    Meant to run in a fresh process, so peak RSS reflects this backend only.
+    """
+    backend = get_backend(name)
+    started = time.perf_counter()
+    backend.library
+    import_seconds = time.perf_counter() - started
+
+    def extract_all():
+        pages, chars, errors = 0, 0, {}
+        for path in pdf_paths:
+            try:
+                for _, text in backend.iter_pages(path):
+                    pages += 1
+                    chars += len(text)
+            except Exception as e:
+                errors[os.path.basename(path)] = str(e)
+        return pages, chars, errors
+
+    rss_before = peak_rss_bytes()
+    started = time.perf_counter()
+    pages, chars, errors = extract_all()
+    seconds = time.perf_counter() - started
+    rss_after = peak_rss_bytes()
+
+    # Tracing slows extraction several-fold, so Python allocations are measured in a second pass
+    tracemalloc.start()
+    extract_all()
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "backend": name,
+        "version": backend.version,
+        "files": len(pdf_paths),
+        "pages": pages,
+        "chars": chars,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 1) if seconds else 0.0,
+        "import_seconds": round(import_seconds, 3),
+        "peak_rss_mb": round(rss_after / (1024 * 1024), 1),
+        "rss_growth_mb": round(max(rss_after - rss_before, 0) / (1024 * 1024), 1),
+        "python_peak_mb": round(python_peak / (1024 * 1024), 2),
+        "errors": errors,
+    }
+
+
+def run_benchmark(directory: str = BENCHMARK_DIR, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Benchmark backends on the PDFs of a directory; missing libraries are skipped.
+
+    Character counts are also given relative to PyPDF2, as a rough check that
+    a faster backend is not simply dropping text.
+    """
+    pdf_paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(".pdf") and not name.startswith(".")
+    )
+    reports = []
+    context = multiprocessing.get_context("spawn")
+    for name in names or list(BACKENDS):
+        backend = get_backend(name)
+        if not backend.available():
+            reports.append({"backend": name, "skipped": f"{backend.distribution} is not installed"})
+            continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            reports.append(pool.submit(benchmark_backend, name, pdf_paths).result())
+
+    baseline = next((r for r in reports if r["backend"] == "pypdf2" and "chars" in r), None)
+    for report in reports:
+        if baseline and baseline["chars"] and "chars" in report:
+            report["chars_vs_pypdf2"] = round(report["chars"] / baseline["chars"], 3)
+    return reports
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else BENCHMARK_DIR
+    columns = ("pages", "seconds", "pages_per_second", "chars", "chars_vs_pypdf2",
+               "import_seconds", "rss_growth_mb", "python_peak_mb")
+    print(f"{'backend':<12}" + "".join(f"{column:>18}" for column in columns))
+    for report in run_benchmark(target, sys.argv[2:] or None):
+        if "skipped" in report:
+            print(f"{report['backend']:<12}  skipped: {report['skipped']}")
+            continue
+        print(f"{report['backend']:<12}" + "".join(f"{str(report.get(column, '-')):>18}" for column in columns))
+        for source, error in report["errors"].items():
+            print(f"{'':<12}  error in {source}: {error}")
@@ -0,0 +1,280 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pdf_backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# PARALLEL, PAGE-STREAMING PDF TEXT EXTRACTION
+# ============================================================================
+#
+# Text is produced page by page and never concatenated into one document
+# string. Sequential extraction reads pages lazily from the file (or from
+# the page text cache) and writes them to the cache as it goes, so memory
+# stays bounded by a single page. Parallel extraction splits work into
+# (file, page range) tasks so that many small files and a few very large
+# ones both spread across the pool. Tasks are submitted in input order and
+# at most TASKS_IN_FLIGHT_PER_WORKER per worker are outstanding. Files are
+# handed back in input order at once and their pages stream out range by
+# range as the pool finishes them, so only the ranges in flight are held,
+# however large the file. A file whose pages are not read before the next
+# file is requested gives up its remaining ranges and parses those pages
+# itself when read.
+# Pages are read by the backend selected with RAG_PDF_EXTRACTOR (see
+# pdf_backends.py); workers are given its name.
+
+EXTRACTION_WORKERS = int(os.getenv("RAG_EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("RAG_PAGES_PER_TASK", "50"))
+TASKS_IN_FLIGHT_PER_WORKER = int(os.getenv("RAG_TASKS_IN_FLIGHT_PER_WORKER", "2"))
+# Workers only need this module; "spawn" keeps them clear of the model threads
+# and locks held by the serving process
+EXTRACTION_START_METHOD = os.getenv("RAG_EXTRACTION_START_METHOD", "spawn")
+# Identifies the text the configured backend produces (the page text cache key)
+EXTRACTOR_VERSION = get_backend().version
+
+
+def iter_pdf_pages(pdf_path: str, start: int = 0, end: Optional[int] = None,
+                   backend: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+    """Lazily yield (page_number, text) for pages [start, end); page numbers are 1-based"""
+    yield from get_backend(backend).iter_pages(pdf_path, start, end)
+
+
+@dataclass
+class ExtractionResult:
+    """Page texts and timing for one PDF.
+
+    ``iter_pages`` streams pages on demand from the page text cache
+    (``cached``), from ranges extracted by the pool (``page_ranges``) or
+    from the file; parsed pages are stored in the cache page by page.
+    """
+    path: str
+    num_pages: int = 0
+    seconds: float = 0.0
+    char_count: int = 0
+    error: Optional[str] = None
+    page_ranges: Optional[Iterator[List[str]]] = field(default=None, repr=False)  # In page order
+    file_hash: Optional[str] = None
+    cached: bool = False
+    cache: Any = field(default=None, repr=False)
+    backend: Optional[str] = None
+
+    @property
+    def source(self) -> str:
+        return os.path.basename(self.path)
+
+    def iter_pages(self) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) pairs in page order"""
+        started = time.perf_counter()
+        try:
+            pages_done = 0
+            if self.cached:
+                pages_done = yield from self._iter_cached_pages()
+            if not self.cached:
+                yield from self._iter_parsed_pages(pages_done)
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Error extracting text from {self.path}: {e}")
+        finally:
+            if self.page_ranges is None:  # Pool workers report their own time
+                self.seconds += time.perf_counter() - started
+            log_extraction(self)
+
+    def _iter_cached_pages(self) -> Iterator[Tuple[int, str]]:
+        # Returns the number of pages read; an unreadable entry is dropped
+        # and the file is parsed from the first page not yet yielded
+        page_number = 0
+        try:
+            for page_number, text in enumerate(self.cache.iter_pages(self.file_hash), 1):
+                self.char_count += len(text)
+                yield page_number, text
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable page text cache entry for {self.source} "
+                           f"after {page_number} pages: {e}")
+            self.cache.discard(self.file_hash)
+            self.cached = False
+        else:
+            self.num_pages = page_number
+        return page_number
+
+    def _iter_parsed_pages(self, start: int) -> Iterator[Tuple[int, str]]:
+        writer = self.cache.writer(self.file_hash) if self.cache is not None and self.file_hash and not start else None
+        pages = self._iter_pool_pages() if self.page_ranges is not None else iter_pdf_pages(
+            self.path, start, backend=self.backend
+        )
+        try:
+            for page_number, text in pages:
+                self.char_count += len(text)
+                if writer is not None:
+                    writer.write(text)
+                self.num_pages = max(self.num_pages, page_number)
+                yield page_number, text
+            if writer is not None:
+                writer.commit()
+                writer = None
+        finally:
+            # Abandoned or failed extractions leave no cache entry
+            if writer is not None:
+                writer.abort()
+
+
+    def _iter_pool_pages(self) -> Iterator[Tuple[int, str]]:
+        # Each range is dropped once its pages are yielded; ranges given up
+        # to later files are parsed here
+        page_number = 0
+        for texts in self.page_ranges:
+            for text in texts:
+                page_number += 1
+                yield page_number, text
+        if page_number < self.num_pages:
+            yield from iter_pdf_pages(self.path, page_number, backend=self.backend)
+
+
+def log_extraction(result: ExtractionResult):
+    """Log per-file extraction size and timing"""
+    if result.char_count == 0:
+        logger.warning(f"No text extracted from {result.path}")
+    origin = " (cached)" if result.cached else ""
+    logger.info(f"Extracted {result.source}{origin}: {result.num_pages} pages, "
+                f"{result.char_count} chars in {result.seconds:.2f}s")
+
+
+def count_pages(pdf_path: str, backend: Optional[str] = None) -> int:
+    """Number of pages in a PDF (0 if it cannot be opened)"""
+    try:
+        return get_backend(backend).page_count(pdf_path)
+    except Exception as e:
+        logger.error(f"Error reading {pdf_path}: {e}")
+        return 0
+
+
+def extract_page_range(pdf_path: str, start: int, end: int,
+                       backend: Optional[str] = None) -> Tuple[List[str], float]:
+    """Extract pages [start, end) of a PDF; returns page texts and elapsed seconds"""
+    started = time.perf_counter()
+    texts = [text for _, text in iter_pdf_pages(pdf_path, start, end, backend)]
+    return texts, time.perf_counter() - started
+
+
+def plan_tasks(page_counts: Dict[str, int], pages_per_task: int) -> List[Tuple[str, int, int]]:
+    """Split files into page-range tasks"""
+    tasks = []
+    for path, num_pages in page_counts.items():
+        for start in range(0, num_pages, pages_per_task):
+            tasks.append((path, start, min(start + pages_per_task, num_pages)))
+    return tasks
+
+
+def cached_result(path: str, file_hash: str, cache: Any, backend: Optional[str] = None) -> ExtractionResult:
+    """Result whose pages are streamed from the page text cache"""
+    return ExtractionResult(path=path, file_hash=file_hash, cached=True, cache=cache, backend=backend)
+
+
+def iter_extracted_pdfs(pdf_paths: List[str], max_workers: Optional[int] = None,
+                        pages_per_task: int = PAGES_PER_TASK, cache: Any = None,
+                        file_hashes: Optional[Dict[str, str]] = None,
+                        backend: Optional[str] = None) -> Iterator[ExtractionResult]:
+    """Extract many PDFs, yielding one result per input path in input order.
+
+    With a single worker, or when everything fits in one task, pages are
+    streamed lazily from disk. Otherwise page ranges run on a process pool
+    and each result streams its pages as they are done; read them before
+    requesting the next result to benefit from the pool.
+    Each file's extraction time is logged so slow PDFs can be spotted.
+    Given a page text cache and the files' content hashes ({path: sha256}),
+    cached files are not parsed and newly parsed ones are stored; the cache
+    must belong to the same backend (default: RAG_PDF_EXTRACTOR).
+    """
+    max_workers = max_workers or EXTRACTION_WORKERS
+    pages_per_task = max(1, pages_per_task)
+    file_hashes = (file_hashes or {}) if cache is not None else {}
+    cached = {path for path in pdf_paths if path in file_hashes and cache.has(file_hashes[path])}
+    started = time.perf_counter()
+    page_counts = {path: count_pages(path, backend) for path in pdf_paths if path not in cached}
+    tasks = plan_tasks(page_counts, pages_per_task)
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        for path in pdf_paths:
+            if path in cached:
+                yield cached_result(path, file_hashes[path], cache, backend)
+                continue
+            yield ExtractionResult(
+                path=path,
+                num_pages=page_counts[path],
+                file_hash=file_hashes.get(path),
+                cache=cache,
+                backend=backend
+            )
+        return
+
+    tasks_by_path: Dict[str, List[Tuple[str, int, int]]] = {path: [] for path in page_counts}
+    for task in tasks:
+        tasks_by_path[task[0]].append(task)
+
+    context = multiprocessing.get_context(EXTRACTION_START_METHOD)
+    workers = min(max_workers, len(tasks))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        # Tasks are consumed in submission order, so the one waited for has
+        # always been submitted; finished ones wait at most a window's worth
+        pending_tasks = iter(tasks)
+        futures = {}
+        released = set()  # Files whose remaining ranges are no longer wanted
+
+        def submit_more():
+            while len(futures) < workers * max(1, TASKS_IN_FLIGHT_PER_WORKER):
+                task = next(pending_tasks, None)
+                if task is None:
+                    return
+                if task[0] not in released:
+                    futures[task] = pool.submit(extract_page_range, *task, backend)
+
+        def release(path: str):
+            released.add(path)
+            for task in tasks_by_path[path]:
+                future = futures.pop(task, None)
+                if future is not None:
+                    future.cancel()
+
+        def iter_ranges(result: ExtractionResult) -> Iterator[List[str]]:
+            for task in tasks_by_path[result.path]:
+                if result.path in released:
+                    return
+                submit_more()
+                try:
+                    texts, seconds = futures.pop(task).result()
+                except Exception as e:
+                    logger.error(f"Error extracting pages {task[1]}-{task[2]} of {result.path}: {e}")
+                    raise
+                result.seconds += seconds
+                yield texts
+
+        previous = None
+        try:
+            for path in pdf_paths:
+                if previous is not None:
+                    release(previous)
+                if path in cached:
+                    yield cached_result(path, file_hashes[path], cache, backend)
+                    continue
+                result = ExtractionResult(
+                    path=path,
+                    num_pages=page_counts[path],
+                    file_hash=file_hashes.get(path),
+                    cache=cache,
+                    backend=backend
+                )
+                result.page_ranges = iter_ranges(result)
+                previous = path
+                yield result
+        finally:
+            # The pool is going away; ranges still wanted are parsed by their results
+            for path in tasks_by_path:
+                release(path)
+
+    logger.info(f"Extracted {len(pdf_paths)} PDFs ({len(tasks)} tasks) in "
+                f"{time.perf_counter() - started:.2f}s with {max_workers} workers")
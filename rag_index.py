@@ -0,0 +1,376 @@
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ann_index import add_to_store, delete_from_store
+from chunk_store import ChunkStore
+from exact_search import AppendedVectors, ExactSearchIndex, exact_index_for_store
+from keyword_index import KeywordHit
+from near_duplicates import NearDuplicateIndex
+
+# ============================================================================
+# LIVE INDEX BUNDLE
+# ============================================================================
+#
+# Everything a query reads lives in one RAGIndex. Writers never mutate the
+# published bundle: they derive a new one and publish it by rebinding a
+# single reference, so a query sees either the old index or the new one,
+# never a mix of the two.
+#
+# Adding documents costs time proportional to the documents, not the
+# corpus: the chunk store gets a new version that shares storage with the
+# old one, new vectors go to AppendedVectors (searched exactly, next to the
+# FAISS index) and the keyword index appends a segment. Once the appended
+# vectors reach APPEND_FOLD_RATIO of the FAISS index they are folded into a
+# copy of it, so that copy is paid for once per many additions.
+#
+# Every chunk has an ID derived from its source file, the file's content
+# hash, the ingestion that added it and its position in the file. The
+# ingestion ID keeps IDs unique when the same content is added again (a
+# deleted file re-uploaded, or a PUT back to an earlier version) while its
+# earlier chunks are still tombstoned. Its text and metadata are kept
+# once, in the chunk store, under an integer key that the vector, keyword
+# and exact indexes refer to. Removing a document only adds
+# its chunk IDs to the tombstone set, which both retrievers filter on; the
+# space is reclaimed later by compacted(), once enough tombstones build up.
+#
+# Near-duplicate chunks are not indexed; the manifest maps each one to the
+# representative chunk that stands in for it ("duplicates") and back
+# ("aliases"). A representative whose own file is removed is "retained" for
+# as long as a chunk of another live file still points to it.
+#
+# Semantic search goes straight to the vectors: while the corpus is below
+# RAG_EXACT_SEARCH_MAX_VECTORS, an ExactSearchIndex scores every chunk with
+# one matrix product; above it, the FAISS index is searched. Both return
+# cosine similarities. Keyword search goes to the keyword backend (in-memory
+# BM25 postings or SQLite FTS5) and returns KeywordHit records keyed by
+# chunk ID.
+
+RETRIEVER_K = 20  # Initial semantic results, widened for reranking
+COMPACTION_RATIO = 0.2  # Compact once this share of indexed chunks is tombstoned
+COMPACTION_MIN_TOMBSTONES = 100
+APPEND_FOLD_RATIO = 0.1  # Fold appended vectors into the FAISS index at this share of its size
+APPEND_FOLD_MIN_VECTORS = 1024
+
+
+def new_ingestion_id() -> str:
+    """ID of one ingestion of a file, distinct from every other ingestion of it"""
+    return uuid.uuid4().hex[:8]
+
+
+def make_chunk_id(source: str, file_hash: str, ingestion: str, ordinal: int) -> str:
+    """ID of the ordinal-th chunk of one ingestion of a file"""
+    return f"{source}:{file_hash[:12]}:{ingestion}:{ordinal}"
+
+
+def chunk_id_source(chunk_id: str) -> str:
+    """Source file encoded in a chunk ID"""
+    return chunk_id.rsplit(":", 3)[0]
+
+
+def assign_chunk_ids(chunks: Iterable[Any], source: str, file_hash: str, ingestion: str) -> Iterator[Any]:
+    """Tag chunks of one ingestion of a file with their IDs, in order"""
+    for ordinal, chunk in enumerate(chunks):
+        chunk.metadata["chunk_id"] = make_chunk_id(source, file_hash, ingestion, ordinal)
+        yield chunk
+
+
+def clone_vector_store(store: Any, chunk_store: Optional[ChunkStore] = None) -> Any:
+    """Independent copy of a FAISS store (flat memory copy of the index) over chunk_store,
+    or over an unshared copy of its own chunk store"""
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    return FAISS(
+        embedding_function=store.embedding_function,
+        index=faiss.clone_index(store.index),
+        docstore=chunk_store if chunk_store is not None else store.docstore.copy(),
+        index_to_docstore_id=dict(store.index_to_docstore_id),
+        normalize_L2=store._normalize_L2,
+        distance_strategy=store.distance_strategy,
+    )
+
+
+@dataclass
+class RAGIndex:
+    """Vector store, keyword index and manifest served as one unit"""
+    vector_store: Any
+    bm25_index: Any
+    tfidf_vectorizer: Any
+    manifest: Dict[str, Any]
+    tombstones: FrozenSet[str] = frozenset()
+    near_duplicates: Optional[NearDuplicateIndex] = None
+    chunk_store: Optional[ChunkStore] = None  # Defaults to the FAISS store's docstore
+    appended: Optional[AppendedVectors] = None  # Vectors not yet folded into the FAISS index
+    exact_index: Optional[ExactSearchIndex] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.chunk_store is None:
+            self.chunk_store = self.vector_store.docstore
+        if self.exact_index is None:
+            self.exact_index = exact_index_for_store(self.vector_store)
+        tombstoned_keys = self.chunks.keys_of(self.tombstones)
+        self._tombstoned_keys = frozenset(tombstoned_keys)
+        self._excluded_rows = self.exact_index.rows_of(tombstoned_keys) if self.exact_index is not None else None
+        self._excluded_appended = self.appended.index.rows_of(tombstoned_keys) if self.appended else None
+        self._excluded_keywords = (
+            self.bm25_index.exclusion(tombstoned_keys) if self.bm25_index is not None and self.tombstones else None
+        )
+
+    @property
+    def chunks(self) -> ChunkStore:
+        """Chunk store every index of this bundle refers to"""
+        return self.chunk_store
+
+    @property
+    def embeddings(self) -> Any:
+        """Embedder the vectors were made with; queries must be encoded by it too"""
+        return self.vector_store.embedding_function
+
+    @property
+    def num_chunks(self) -> int:
+        return self.manifest.get("num_chunks", 0)
+
+    @property
+    def num_files(self) -> int:
+        return len(self.manifest.get("files", {}))
+
+    def has_source(self, source: str) -> bool:
+        return source in self.manifest.get("files", {})
+
+    def source_chunk_ids(self, source: str) -> List[str]:
+        """IDs of the indexed chunks of one file, rebuilt from the manifest"""
+        file_hash = self.manifest["files"][source]
+        ingestion = self.manifest["ingestions"][source]
+        count = self.manifest.get("chunks", {}).get(source, 0)
+        return [make_chunk_id(source, file_hash, ingestion, i) for i in range(count)]
+
+    def _derive(self, **changes) -> "RAGIndex":
+        fields = {
+            "vector_store": self.vector_store,
+            "bm25_index": self.bm25_index,
+            "tfidf_vectorizer": self.tfidf_vectorizer,
+            "manifest": self.manifest,
+            "tombstones": self.tombstones,
+            "near_duplicates": self.near_duplicates,
+            "chunk_store": self.chunk_store,
+            "appended": self.appended,
+        }
+        fields.update(changes)
+        if "vector_store" not in changes:
+            fields["exact_index"] = self.exact_index
+        return RAGIndex(**fields)
+
+    def is_live(self, chunk_id: str) -> bool:
+        return chunk_id not in self.tombstones
+
+    def search_by_vectors(self, query_vectors: np.ndarray, k: int = RETRIEVER_K) -> List[List[Tuple[Any, float]]]:
+        """Top k live (document, cosine similarity) pairs for each query vector, best first"""
+        query_vectors = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if self.exact_index is not None:
+            keys = self.exact_index.keys
+            results = [
+                [(int(keys[row]), score) for row, score in hits]
+                for hits in self.exact_index.search(query_vectors, k, self._excluded_rows)
+            ]
+        else:
+            results = self._search_vector_store(query_vectors, k)
+        if self.appended:
+            keys = self.appended.keys
+            appended_hits = self.appended.index.search(query_vectors, k, self._excluded_appended)
+            for hits, extra in zip(results, appended_hits):
+                hits.extend((int(keys[row]), score) for row, score in extra)
+                hits.sort(key=lambda hit: hit[1], reverse=True)
+                del hits[k:]
+        chunks = self.chunks
+        return [[(chunks.document(key), score) for key, score in hits] for hits in results]
+
+    def _search_vector_store(self, query_vectors: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """Top k live (chunk key, cosine similarity) pairs from the FAISS index"""
+        store = self.vector_store
+        if store.index.ntotal == 0:
+            return [[] for _ in query_vectors]
+        if store._normalize_L2:
+            import faiss
+
+            query_vectors = query_vectors.copy()
+            faiss.normalize_L2(query_vectors)
+        # Over-fetch by the number of tombstones so k live chunks always remain
+        excluded = self._tombstoned_keys
+        distances, positions = store.index.search(query_vectors, min(k + len(excluded), store.index.ntotal))
+        results = []
+        for row_distances, row_positions in zip(distances, positions):
+            hits = []
+            for distance, position in zip(row_distances, row_positions):
+                if position < 0:
+                    continue
+                key = store.index_to_docstore_id[int(position)]
+                if key in excluded:
+                    continue
+                # Squared L2 distance between unit vectors is 2 - 2 * cosine
+                hits.append((key, 1.0 - float(distance) / 2.0))
+                if len(hits) == k:
+                    break
+            results.append(hits)
+        return results
+
+    def keyword_search(self, query: str, k: int = 10) -> List[KeywordHit]:
+        """Top k live chunks by BM25 score, best first"""
+        bm25_index = self.bm25_index
+        if bm25_index is None:
+            return []
+        chunks = self.chunks
+        hits = []
+        for key, score in bm25_index.search(query, k, self._excluded_keywords):
+            record = chunks.record(key)
+            metadata = dict(chunks.metadata(key), score=score)
+            hits.append(KeywordHit(key, record.chunk_id, score, record.text, metadata))
+        return hits
+
+    def with_documents(self, chunks: List[Any], vectors: List[List[float]],
+                       file_hashes: Optional[Dict[str, str]] = None,
+                       ingestions: Optional[Dict[str, str]] = None,
+                       duplicates: Optional[Dict[str, str]] = None,
+                       near_duplicates: Optional[NearDuplicateIndex] = None) -> "RAGIndex":
+        """Copy-on-write append of pre-embedded chunks, in time proportional to them.
+
+        The chunk store and keyword index get new versions that share this
+        bundle's storage, and the vectors are appended to the exact-searched
+        AppendedVectors; this bundle is unchanged. Once enough vectors have
+        been appended, they are folded into a copy of the FAISS index.
+        Embedding happens before this call. Chunks must carry a chunk_id;
+        ``ingestions`` maps each source in ``file_hashes`` to the ingestion
+        ID in its chunks' IDs. ``duplicates`` maps dropped near-duplicate
+        chunk IDs to their representatives, and ``near_duplicates`` is the
+        signature index that already includes the new representatives.
+        """
+        duplicates = duplicates or {}
+        chunk_store, keys = self.chunks.extended(chunks)
+        vector_store, appended = self.vector_store, self.appended
+        if chunks:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            appended = (appended or AppendedVectors(vectors.shape[1])).append(keys, vectors)
+            if len(appended) >= max(APPEND_FOLD_MIN_VECTORS, APPEND_FOLD_RATIO * vector_store.index.ntotal):
+                vector_store = clone_vector_store(vector_store, chunk_store)
+                add_to_store(vector_store, appended.keys.tolist(), appended.matrix)
+                appended = None
+
+        bm25_index = self.bm25_index
+        if bm25_index is not None:
+            bm25_index = bm25_index.copy()
+            bm25_index.add_documents([chunk.page_content for chunk in chunks], keys)
+
+        # Only the parts of the manifest that change are copied
+        manifest = dict(self.manifest)
+        manifest["files"] = dict(manifest.get("files", {}), **(file_hashes or {}))
+        manifest["ingestions"] = dict(manifest.get("ingestions", {}), **(ingestions or {}))
+        chunk_counts = manifest["chunks"] = dict(manifest.get("chunks", {}))
+        for source in [chunk.metadata["source"] for chunk in chunks] + [chunk_id_source(d) for d in duplicates]:
+            chunk_counts[source] = chunk_counts.get(source, 0) + 1
+        manifest["num_chunks"] = manifest.get("num_chunks", 0) + len(chunks)
+
+        # Record near-duplicates and credit their sources on already indexed representatives
+        if duplicates:
+            manifest["duplicates"] = dict(manifest.get("duplicates", {}), **duplicates)
+            aliases = manifest["aliases"] = dict(manifest.get("aliases", {}))
+            for duplicate_id, representative_id in duplicates.items():
+                aliases[representative_id] = aliases.get(representative_id, []) + [duplicate_id]
+                key = chunk_store.key_of(representative_id)
+                if key is not None:
+                    chunk_store.add_source(key, chunk_id_source(duplicate_id))
+
+        return self._derive(
+            vector_store=vector_store,
+            bm25_index=bm25_index,
+            manifest=manifest,
+            chunk_store=chunk_store,
+            appended=appended,
+            near_duplicates=near_duplicates if near_duplicates is not None else self.near_duplicates
+        )
+
+    def without_source(self, source: str) -> "RAGIndex":
+        """Tombstone every chunk of one file; costs time proportional to that file.
+
+        Representatives that near-duplicates of other files still point to
+        are retained instead, and a retained representative is tombstoned
+        once its last duplicate goes. Representatives that are kept but lose
+        files have their sources reassigned to the files still pointing to
+        them (a retained one is cited as the first of those).
+        """
+        duplicates = dict(self.manifest.get("duplicates", {}))
+        aliases = dict(self.manifest.get("aliases", {}))
+        retained = set(self.manifest.get("retained", []))
+        removed, changed = [], set()
+        for chunk_id in self.source_chunk_ids(source):
+            representative_id = duplicates.pop(chunk_id, None)
+            if representative_id is not None:
+                remaining = [alias for alias in aliases.get(representative_id, []) if alias != chunk_id]
+                changed.add(representative_id)
+                if remaining:
+                    aliases[representative_id] = remaining
+                else:
+                    aliases.pop(representative_id, None)
+                    if representative_id in retained:
+                        retained.discard(representative_id)
+                        removed.append(representative_id)
+            elif aliases.get(chunk_id):
+                retained.add(chunk_id)
+                changed.add(chunk_id)
+            else:
+                removed.append(chunk_id)
+
+        chunk_store = self.chunk_store
+        changed.difference_update(removed)
+        if changed:
+            chunk_store, _ = chunk_store.extended([])
+            for representative_id in changed:
+                key = chunk_store.key_of(representative_id)
+                if key is None:
+                    continue
+                sources = [chunk_id_source(alias) for alias in aliases.get(representative_id, [])]
+                if representative_id not in retained:
+                    sources.insert(0, chunk_id_source(representative_id))
+                chunk_store.set_sources(key, sources)
+
+        manifest = dict(self.manifest)
+        manifest["files"] = {name: h for name, h in self.manifest["files"].items() if name != source}
+        manifest["chunks"] = {name: n for name, n in self.manifest.get("chunks", {}).items() if name != source}
+        manifest["ingestions"] = {name: i for name, i in self.manifest.get("ingestions", {}).items() if name != source}
+        manifest["duplicates"] = duplicates
+        manifest["aliases"] = aliases
+        manifest["retained"] = sorted(retained)
+        manifest["num_chunks"] = self.num_chunks - len(removed)
+        return self._derive(manifest=manifest, tombstones=self.tombstones.union(removed), chunk_store=chunk_store)
+
+    def needs_compaction(self) -> bool:
+        indexed = self.num_chunks + len(self.tombstones)
+        return len(self.tombstones) >= max(COMPACTION_MIN_TOMBSTONES, COMPACTION_RATIO * indexed)
+
+    def compacted(self) -> "RAGIndex":
+        """Physically remove tombstoned chunks from copies of the indexes, folding in appended vectors"""
+        if not self.tombstones:
+            return self
+        vector_store = self.merged_vector_store()
+        removed_keys = vector_store.docstore.keys_of(self.tombstones)
+        delete_from_store(vector_store, removed_keys)
+        bm25_index = self.bm25_index.without(removed_keys) if self.bm25_index is not None else None
+        near_duplicates = self.near_duplicates
+        if near_duplicates is not None:
+            near_duplicates = near_duplicates.without(self.tombstones)
+        return self._derive(
+            vector_store=vector_store,
+            bm25_index=bm25_index,
+            tombstones=frozenset(),
+            near_duplicates=near_duplicates,
+            chunk_store=vector_store.docstore,
+            appended=None
+        )
+
+    def merged_vector_store(self) -> Any:
+        """Unshared FAISS store over all of this bundle's vectors, appended ones included"""
+        vector_store = clone_vector_store(self.vector_store, self.chunks.copy())
+        if self.appended:
+            add_to_store(vector_store, self.appended.keys.tolist(), self.appended.matrix)
+        return vector_store
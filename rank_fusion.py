@@ -0,0 +1,99 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# ============================================================================
+# RANK FUSION
+# ============================================================================
+#
+# Semantic and keyword retrieval run as separate branches and each returns
+# a ranked list of (document, score). Fusion merges those lists without
+# searching again. Documents are matched on their chunk-store key, so a
+# chunk found by both retrievers is counted once and gets credit from both.
+#
+#   rrf        reciprocal rank fusion: sum of weight / (RRF_K + rank). Uses
+#              ranks only, so the retrievers' score scales do not matter.
+#   weighted   scores are min-max normalized within each list and summed
+#              with the given weights; a document missing from a list gets
+#              0 from it.
+#
+# Chosen with RAG_FUSION_METHOD; RAG_FUSION_SEMANTIC_WEIGHT sets the weight
+# of the semantic list (the keyword list gets the rest).
+
+FUSION_METHOD = os.getenv("RAG_FUSION_METHOD", "rrf").lower()
+FUSION_SEMANTIC_WEIGHT = float(os.getenv("RAG_FUSION_SEMANTIC_WEIGHT", "0.5"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+RankedList = Sequence[Tuple[Any, float]]
+
+
+def document_key(doc: Any) -> Any:
+    """Identity of a retrieved chunk: its chunk-store key, else its chunk ID, else its text"""
+    metadata = doc.metadata
+    key = metadata.get("chunk_key")
+    if key is not None:
+        return key
+    return metadata.get("chunk_id") or doc.page_content
+
+
+def _collect(ranked_lists: Sequence[RankedList]) -> Dict[Any, Any]:
+    """First document object seen for each key; earlier lists take precedence"""
+    documents: Dict[Any, Any] = {}
+    for ranked in ranked_lists:
+        for doc, _ in ranked:
+            documents.setdefault(document_key(doc), doc)
+    return documents
+
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[RankedList], weights: Sequence[float],
+                           rrf_k: int = RRF_K) -> Dict[Any, float]:
+    fused: Dict[Any, float] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        seen = set()
+        for rank, (doc, _) in enumerate(ranked, 1):
+            key = document_key(doc)
+            if key in seen:
+                continue
+            seen.add(key)
+            fused[key] = fused.get(key, 0.0) + weight / (rrf_k + rank)
+    return fused
+
+
+def weighted_score_fusion(ranked_lists: Sequence[RankedList], weights: Sequence[float]) -> Dict[Any, float]:
+    fused: Dict[Any, float] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        if not ranked:
+            continue
+        scores = [score for _, score in ranked]
+        low, high = min(scores), max(scores)
+        best: Dict[Any, float] = {}
+        for doc, score in ranked:
+            # A list whose scores are all equal contributes its full weight to each entry
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            key = document_key(doc)
+            best[key] = max(best.get(key, 0.0), normalized)
+        for key, normalized in best.items():
+            fused[key] = fused.get(key, 0.0) + weight * normalized
+    return fused
+
+
+def fuse(ranked_lists: Sequence[RankedList], limit: int, method: str = FUSION_METHOD,
+         weights: Optional[Sequence[float]] = None) -> List[Tuple[Any, float]]:
+    """Merge ranked (document, score) lists into the best limit (document, fused score) pairs"""
+    weights = list(weights) if weights is not None else [1.0] * len(ranked_lists)
+    if method == "rrf":
+        fused = reciprocal_rank_fusion(ranked_lists, weights)
+    elif method == "weighted":
+        fused = weighted_score_fusion(ranked_lists, weights)
+    else:
+        raise ValueError(f"Unknown fusion method {method!r}; choose rrf or weighted")
+    documents = _collect(ranked_lists)
+    # Python's sort is stable, so ties keep the order documents were first seen in
+    ranked = sorted(documents, key=lambda key: fused[key], reverse=True)
+    return [(documents[key], fused[key]) for key in ranked[:limit]]
+
+
+def fuse_hybrid(semantic_hits: RankedList, keyword_hits: RankedList, limit: int,
+                method: str = FUSION_METHOD, semantic_weight: float = FUSION_SEMANTIC_WEIGHT) -> List[Any]:
+    """Fused documents of the semantic and keyword branches, best first"""
+    fused = fuse([semantic_hits, keyword_hits], limit, method, [semantic_weight, 1.0 - semantic_weight])
+    return [doc for doc, _ in fused]
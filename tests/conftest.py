@@ -0,0 +1,133 @@
+import hashlib
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import VECTOR_INDEX_SETTINGS, build_vector_store
+from chunk_store import ChunkStore
+from keyword_index import IncrementalBM25
+from near_duplicates import NearDuplicateIndex, deduplicate
+from rag_index import RAGIndex, assign_chunk_ids, chunk_id_source, new_ingestion_id
+
+DIMENSION = 16
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic unit vectors derived from the text, so identical texts embed identically"""
+
+    def __init__(self, dimension: int = DIMENSION):
+        self.dimension = dimension
+        self.queries = 0
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+        vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.queries += 1
+        return self._vector(text)
+
+
+def make_chunks(source: str, file_hash: str, texts: List[str], ingestion: str) -> List[Document]:
+    """Chunk Documents of one ingestion of a file, tagged with their chunk IDs"""
+    chunks = [Document(page_content=text, metadata={"source": source, "page": 0}) for text in texts]
+    return list(assign_chunk_ids(chunks, source, file_hash, ingestion))
+
+
+def build_index(files: Dict[str, Tuple[str, List[str]]], embeddings: Embeddings,
+                near_duplicates: bool = False, keyword_index: Optional[Any] = None) -> RAGIndex:
+    """RAGIndex over {source: (file hash, chunk texts)}, built the way a full rebuild is.
+
+    With near_duplicates, later chunks that nearly repeat earlier ones are
+    dropped and recorded, and later uploads are deduplicated too.
+    keyword_index is an empty keyword index to use instead of IncrementalBM25.
+    """
+    ingestions = {source: new_ingestion_id() for source in files}
+    documents = [
+        chunk for source, (file_hash, texts) in files.items()
+        for chunk in make_chunks(source, file_hash, texts, ingestions[source])
+    ]
+    duplicate_index, duplicates = None, {}
+    if near_duplicates:
+        duplicate_index = NearDuplicateIndex(3)
+        documents, duplicates = deduplicate(documents, duplicate_index)
+    chunk_store = ChunkStore()
+    keys = chunk_store.add_chunks(documents)
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+    vector_store, built = build_vector_store(chunk_store, keys, vectors, embeddings, dict(VECTOR_INDEX_SETTINGS, type="flat"))
+    bm25_index = keyword_index if keyword_index is not None else IncrementalBM25()
+    bm25_index.add_documents([doc.page_content for doc in documents], keys)
+    manifest = {
+        "files": {source: file_hash for source, (file_hash, _) in files.items()},
+        "chunks": {source: len(texts) for source, (_, texts) in files.items()},
+        "ingestions": ingestions,
+        "num_chunks": len(documents),
+        "vector_index_built": built,
+        "duplicates": duplicates,
+        "aliases": aliases_of(duplicates),
+    }
+    return RAGIndex(vector_store=vector_store, bm25_index=bm25_index, tfidf_vectorizer=None, manifest=manifest,
+                    near_duplicates=duplicate_index)
+
+
+def aliases_of(duplicates: Dict[str, str]) -> Dict[str, List[str]]:
+    aliases: Dict[str, List[str]] = {}
+    for duplicate_id, representative_id in duplicates.items():
+        aliases.setdefault(representative_id, []).append(duplicate_id)
+    return aliases
+
+
+def add_file(index: RAGIndex, source: str, file_hash: str, texts: List[str], embeddings: Embeddings) -> RAGIndex:
+    """Index with one file added (or replaced) the way an upload commits it"""
+    if index.has_source(source):
+        index = index.without_source(source)
+    ingestion = new_ingestion_id()
+    chunks = make_chunks(source, file_hash, texts, ingestion)
+    duplicate_index, duplicates = index.near_duplicates, {}
+    if duplicate_index is not None:
+        duplicate_index = duplicate_index.copy()
+        chunks, duplicates = deduplicate(
+            chunks, duplicate_index, lambda chunk_id: index.is_live(chunk_id) and chunk_id_source(chunk_id) != source
+        )
+    vectors = np.asarray(embeddings.embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+    return index.with_documents(chunks, vectors, {source: file_hash}, {source: ingestion}, duplicates, duplicate_index)
+
+
+@pytest.fixture
+def embeddings() -> HashEmbeddings:
+    return HashEmbeddings()
+
+
+@pytest.fixture(scope="session")
+def main_module():
+    """The service module; importing it loads no model, but it requires the API key variables"""
+    for key in ("OPENAI_API_KEY", "GROQ_API_KEY", "GOOGLE_API_KEY"):
+        os.environ.setdefault(key, "test")
+    import main
+    return main
+
+
+@pytest.fixture
+def service(main_module, tmp_path, monkeypatch):
+    """main with its upload folder, corpus folders and index state reset to a temporary directory"""
+    pdf_folder, other_folder = tmp_path / "pdfs", tmp_path / "media"
+    pdf_folder.mkdir()
+    other_folder.mkdir()
+    monkeypatch.setattr(main_module, "PDF_FOLDER", str(pdf_folder))
+    monkeypatch.setattr(main_module, "CORPUS_DIRS", [str(pdf_folder), str(other_folder)])
+    monkeypatch.setattr(main_module, "rag_index", None)
+    monkeypatch.setattr(main_module, "uploaded_hashes", {})
+    monkeypatch.setattr(main_module, "corpus_hashes", {})
+    monkeypatch.setattr(main_module, "compact_index_if_needed", lambda: None)
+    return main_module
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from ann_index import (
+    VECTOR_INDEX_SETTINGS, base_index, build_index, code_bytes, compare_compressions, rescore_hits,
+    stores_full_vectors
+)
+
+DIMENSION = 32
+
+
+def settings(**overrides):
+    return {**VECTOR_INDEX_SETTINGS, "type": "flat", "compression": "none", "pca_dim": 0, "rescore": 0, **overrides}
+
+
+def unit_vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def self_recall(index, vectors):
+    _, found = index.search(vectors, 1)
+    return float(np.mean(found[:, 0] == np.arange(len(vectors))))
+
+
+@pytest.mark.parametrize("compression, bytes_per_vector", [("none", 4 * DIMENSION), ("float16", 2 * DIMENSION),
+                                                           ("int8", DIMENSION)])
+def test_compressed_indexes_store_smaller_codes(compression, bytes_per_vector):
+    vectors = unit_vectors(500)
+    index, built = build_index(vectors, settings(compression=compression))
+    assert built["compression"] == compression
+    assert code_bytes(index) == bytes_per_vector
+    assert stores_full_vectors(index) == (compression == "none")
+    assert self_recall(index, vectors) >= 0.98
+
+
+def test_pca_is_fitted_only_with_enough_vectors():
+    vectors = unit_vectors(500)
+    index, built = build_index(vectors, settings(pca_dim=8))
+    assert built["pca_dim"] == 8 and built["trained_vectors"] == 500
+    assert index.d == DIMENSION and base_index(index).d == 8
+    assert not stores_full_vectors(index)
+    assert code_bytes(index) == 4 * 8
+
+    # Fewer vectors than dimensions cannot fit a PCA; the index keeps them whole
+    index, built = build_index(vectors[:10], settings(pca_dim=8))
+    assert built["pca_dim"] == 0 and base_index(index).d == DIMENSION
+
+
+class Doc:
+    def __init__(self, name):
+        self.name = name
+
+
+def test_rescoring_reorders_candidates_by_full_precision_similarity():
+    query = np.array([[1.0, 0.0]], dtype=np.float32)
+    near, far, unknown = Doc("near"), Doc("far"), Doc("unknown")
+    full = {"near": np.array([3.0, 0.3]), "far": np.array([0.0, 1.0])}
+    candidates = [[(far, 0.9), (unknown, 0.5), (near, 0.1)]]
+    rescored = rescore_hits(query, candidates, lambda docs: [full.get(doc.name) for doc in docs], 2)
+    # Scores are cosine similarities of the normalized vectors; unknown keeps its compact score
+    assert [(doc.name, round(score, 3)) for doc, score in rescored[0]] == [("near", 0.995), ("unknown", 0.5)]
+
+
+def test_compression_report_counts_rescored_rows_and_resident_memory():
+    reports = compare_compressions(unit_vectors(1000), settings(pca_dim=16), k=5, num_queries=20)
+    by_variant = {(report["compression"], report["pca_dim"]): report for report in reports}
+    assert by_variant[("none", DIMENSION)]["memory_saved"] == "0%"
+    assert by_variant[("int8", DIMENSION)]["bytes_per_vector"] == DIMENSION
+    assert ("none", 16) in by_variant
+    for report in reports:
+        # Rescoring 4 * k candidates per query reads at most that many full rows
+        assert 0 < report["rescore_mb"] * 1024 * 1024 <= 20 * 4 * 5 * 4 * DIMENSION
+        assert report["rescored"] >= report["recall@5"] - 0.05
+        assert report["resident_mb"] is None or report["resident_mb"] > 0
+    int8 = by_variant[("int8", DIMENSION)]
+    assert int(int8["rescored_saved"].rstrip("%")) <= int(int8["memory_saved"].rstrip("%"))
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from chunk_features import FEATURE_CRM_TERMS, FEATURE_RECENT, add_chunk_features, feature_flags
+from chunk_store import ChunkStore, key_positions
+
+
+def chunk(chunk_id, text="some text", source="a.pdf", **metadata):
+    return Document(page_content=text, metadata=dict(metadata, chunk_id=chunk_id, source=source))
+
+
+def test_keys_are_increasing_and_never_reused():
+    store = ChunkStore()
+    assert store.add_chunks([chunk("a:1"), chunk("a:2")]) == [0, 1]
+    store.remove([1])
+    assert store.add_chunks([chunk("a:3")]) == [2]
+    assert store.keys_of(["a:1", "a:2", "a:3"]) == [0, 2]
+    assert store.key_of("a:2") is None
+
+
+def test_documents_are_rebuilt_from_records():
+    store = ChunkStore()
+    [key] = store.add_chunks([chunk("a:1", text="hello", page=3, display_text="Hello")])
+    document = store.document(key)
+    assert document.page_content == "hello"
+    assert document.id == "a:1"
+    assert document.metadata["page"] == 3
+    assert document.metadata["display_text"] == "Hello"
+    assert document.metadata["chunk_key"] == key
+    assert "sources" not in document.metadata
+
+    store.add_source(key, "b.pdf")
+    store.add_source(key, "b.pdf")
+    assert store.metadata(key)["sources"] == ["a.pdf", "b.pdf"]
+
+
+def test_stored_chunk_id_cannot_be_added_again():
+    store = ChunkStore()
+    store.add_chunks([chunk("a:1")])
+    with pytest.raises(ValueError):
+        store.add_chunks([chunk("a:1")])
+    with pytest.raises(ValueError):
+        store.add({5: chunk("a:1")})
+    assert store.key_of("a:1") == 0
+
+    store.remove([0])
+    assert store.add_chunks([chunk("a:1")]) == [1]
+
+
+def test_copy_is_independent():
+    store = ChunkStore()
+    store.add_chunks([chunk("a:1")])
+    clone = store.copy()
+    clone.add_chunks([chunk("a:2")])
+    clone.remove([0])
+    assert len(store) == 1 and store.key_of("a:1") == 0
+    assert len(clone) == 1 and clone.key_of("a:2") == 1
+
+
+def test_extended_versions_see_only_their_own_chunks():
+    base = ChunkStore()
+    base.add_chunks([chunk("a:1"), chunk("a:2")])
+    newer, keys = base.extended([chunk("b:1")])
+    assert keys == [2]
+    newer.add_source(0, "b.pdf")
+    assert newer.records is base.records  # Extending the newest version shares its records
+    assert len(base) == 2 and base.key_of("b:1") is None and 2 not in base
+    assert "sources" not in base.metadata(0)
+    assert newer.key_of("b:1") == 2 and newer.metadata(0)["sources"] == ["a.pdf", "b.pdf"]
+
+    # Extending a version that is no longer the newest starts from a copy
+    branch, keys = base.extended([chunk("c:1")])
+    assert keys == [2]
+    assert branch.records is not base.records
+    assert branch.key_of("b:1") is None and branch.document(2).id == "c:1"
+    assert newer.document(2).id == "b:1"
+
+    clone = newer.copy()
+    assert clone.metadata(0)["sources"] == ["a.pdf", "b.pdf"] and not clone.overrides
+    assert base.copy().keys_of(["a:1", "b:1", "c:1"]) == [0]
+
+
+def test_docstore_interface():
+    store = ChunkStore()
+    store.add({7: chunk("a:1")})
+    assert store.search(7).page_content == "some text"
+    assert store.next_key == 8
+    store.delete([7])
+    assert isinstance(store.search(7), str)
+
+
+def test_key_positions():
+    keys = np.array([2, 5, 9, 14], dtype=np.int64)
+    assert key_positions(keys, [9, 2, 3, 20]).tolist() == [2, 0]
+    assert key_positions(keys, []).tolist() == []
+    assert key_positions(np.array([], dtype=np.int64), [1]).tolist() == []
+
+
+def test_feature_flags_are_stored_packed():
+    store = ChunkStore()
+    ingested = add_chunk_features(chunk("a:1", text="Create a lead in Studynet"))
+    key, _ = store.add_chunks([ingested, chunk("a:2", source="recent_updates.pdf")])
+    assert store.record(key).feature_flags == FEATURE_CRM_TERMS
+    assert feature_flags(store.document(key)) == FEATURE_CRM_TERMS
+    assert "features" not in store.metadata(key)
+    # Chunks stored without flags have them computed when read
+    assert store.record(key + 1).feature_flags is None
+    assert feature_flags(store.document(key + 1)) == FEATURE_RECENT
@@ -0,0 +1,169 @@
+import dataclasses
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+
+from conftest import build_index
+from ingestion_jobs import IngestionJob
+from uploads import ReceivedFile, stream_to_temp
+
+
+def sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def write(folder, name, content):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def upload(service, content, filename):
+    return service.store_upload(io.BytesIO(content), filename)
+
+
+# ============================================================================
+# Duplicate detection while the index is being built
+# ============================================================================
+
+def test_duplicates_are_found_in_the_corpus_before_an_index_is_published(service):
+    media = service.CORPUS_DIRS[1]
+    write(media, "report.pdf", b"%PDF report")
+    assert service.rag_index is None
+
+    assert upload(service, b"%PDF report", "copy.pdf") == (None, "report.pdf", True)
+    # The startup build hashes corpus files through the same cache
+    assert [entry[2] for entry in service.corpus_hashes.values()] == [sha256(b"%PDF report")]
+
+    path, name, is_duplicate = upload(service, b"%PDF other", "other.pdf")
+    assert (name, is_duplicate) == ("other.pdf", False)
+    assert os.listdir(service.PDF_FOLDER) == ["other.pdf"]
+
+
+def test_uploads_waiting_for_the_index_are_duplicates_until_indexed(service, embeddings, monkeypatch):
+    service.rag_index = build_index({"a.pdf": (sha256(b"%PDF a"), ["alpha"])}, embeddings)
+    assert upload(service, b"%PDF a", "again.pdf") == (None, "a.pdf", True)
+
+    path, name, _ = upload(service, b"%PDF new", "new.pdf")
+    # The first upload is not indexed yet, so only the pending upload table knows its content
+    assert upload(service, b"%PDF new", "new-copy.pdf") == (None, "new.pdf", True)
+    assert service.uploaded_hashes == {sha256(b"%PDF new"): path}
+
+    def add_pdf_to_index(pdf_path, job=None, source=None):
+        files = dict(service.rag_index.manifest["files"], **{os.path.basename(pdf_path): sha256(b"%PDF new")})
+        service.rag_index = dataclasses.replace(service.rag_index, manifest=dict(service.rag_index.manifest, files=files))
+        return 1
+
+    monkeypatch.setattr(service, "add_pdf_to_index", add_pdf_to_index)
+    service.run_upload_job(IngestionJob(job_id="upload", kind="upload", files=[name]), [path])
+    # Once indexed, the manifest takes over and the pending entry is dropped
+    assert service.uploaded_hashes == {}
+    assert upload(service, b"%PDF new", "new-copy.pdf") == (None, "new.pdf", True)
+
+
+def test_pending_upload_removed_from_disk_is_not_a_duplicate(service, embeddings):
+    service.rag_index = build_index({"a.pdf": (sha256(b"%PDF a"), ["alpha"])}, embeddings)
+    path, _, _ = upload(service, b"%PDF new", "new.pdf")
+    os.remove(path)
+    path, name, is_duplicate = upload(service, b"%PDF new", "new.pdf")
+    assert (name, is_duplicate) == ("new.pdf", False) and os.path.exists(path)
+
+
+def test_failed_upload_job_forgets_the_removed_file(service, embeddings, monkeypatch):
+    service.rag_index = build_index({"a.pdf": (sha256(b"%PDF a"), ["alpha"])}, embeddings)
+    path, name, _ = upload(service, b"%PDF broken", "broken.pdf")
+
+    def add_pdf_to_index(pdf_path, job=None, source=None):
+        raise ValueError("no text")
+
+    monkeypatch.setattr(service, "add_pdf_to_index", add_pdf_to_index)
+    job = IngestionJob(job_id="upload", kind="upload", files=[name])
+    with pytest.raises(Exception, match="No uploaded file could be indexed"):
+        service.run_upload_job(job, [path])
+    assert job.errors == ["broken.pdf: no text"]
+    assert not os.path.exists(path) and service.uploaded_hashes == {}
+    assert upload(service, b"%PDF broken", "broken.pdf")[2] is False
+
+
+# ============================================================================
+# Bulk uploads
+# ============================================================================
+
+def received_zip(service, members, name="batch.zip"):
+    """ReceivedFile of a zip archive as the bulk endpoint stores it: a temporary file in PDF_FOLDER"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for member, content in members:
+            archive.writestr(member, content)
+    path = write(service.PDF_FOLDER, ".upload-test.part", buffer.getvalue())
+    return ReceivedFile(name, path, sha256(buffer.getvalue()), len(buffer.getvalue()))
+
+
+def test_bulk_zip_reports_each_member(service, monkeypatch):
+    write(service.CORPUS_DIRS[1], "known.pdf", b"%PDF known")
+    monkeypatch.setattr(service, "stream_to_temp", lambda source, dest_dir: stream_to_temp(source, dest_dir, 100))
+    entries = service.store_bulk_upload(received_zip(service, [
+        ("docs/report.pdf", b"%PDF report"),
+        ("other/report.pdf", b"%PDF second report"),
+        ("docs/copy-of-known.pdf", b"%PDF known"),
+        ("docs/again.pdf", b"%PDF report"),
+        ("docs/huge.pdf", b"%PDF " + b"x" * 200),
+        ("docs/readme.txt", b"text"),
+        ("docs/.hidden.pdf", b"%PDF hidden"),
+        ("__MACOSX/docs/._report.pdf", b"resource fork"),
+    ]))
+
+    by_member = {entry["filename"]: entry for entry in entries}
+    assert list(by_member) == ["docs/report.pdf", "other/report.pdf", "docs/copy-of-known.pdf", "docs/again.pdf",
+                               "docs/huge.pdf", "docs/readme.txt"]
+    assert all(entry.get("archive") == "batch.zip" for name, entry in by_member.items() if name != "docs/readme.txt")
+    assert by_member["docs/report.pdf"]["stored_as"] == "report.pdf"
+    # Same name, different content: the second one is stored under a new name
+    assert by_member["other/report.pdf"]["stored_as"] == "report_1.pdf"
+    assert by_member["docs/copy-of-known.pdf"] == {"filename": "docs/copy-of-known.pdf", "status": "duplicate",
+                                                   "existing_filename": "known.pdf", "archive": "batch.zip"}
+    assert by_member["docs/again.pdf"]["existing_filename"] == "report.pdf"
+    assert by_member["docs/huge.pdf"]["status"] == "rejected" and "too large" in by_member["docs/huge.pdf"]["detail"]
+    assert by_member["docs/readme.txt"] == {"filename": "docs/readme.txt", "status": "rejected", "detail": "Not a PDF"}
+    # The archive and every temporary file are gone; only the accepted PDFs remain
+    assert sorted(os.listdir(service.PDF_FOLDER)) == ["report.pdf", "report_1.pdf"]
+
+
+def test_bulk_upload_rejects_bad_archives_and_other_types(service):
+    broken = write(service.PDF_FOLDER, ".upload-broken.part", b"not a zip")
+    assert service.store_bulk_upload(ReceivedFile("broken.zip", broken, sha256(b"not a zip"), 9)) == [
+        {"filename": "broken.zip", "status": "rejected", "detail": "Not a valid zip archive"}]
+    assert service.store_bulk_upload(ReceivedFile("notes.txt"))[0]["status"] == "rejected"
+    oversized = ReceivedFile("big.pdf", error="File size too large. Maximum 50MB allowed.")
+    assert service.store_bulk_upload(oversized) == [
+        {"filename": "big.pdf", "status": "rejected", "detail": "File size too large. Maximum 50MB allowed."}]
+    assert os.listdir(service.PDF_FOLDER) == []
+
+
+def test_bulk_job_reports_failures_and_removes_their_files(service, embeddings, monkeypatch):
+    service.rag_index = build_index({"a.pdf": (sha256(b"%PDF a"), ["alpha"])}, embeddings)
+    entries = service.store_bulk_upload(received_zip(service, [("good.pdf", b"%PDF good"), ("empty.pdf", b"%PDF")]))
+    paths = [entry["path"] for entry in entries]
+    assert len(service.uploaded_hashes) == 2
+
+    def add_pdfs_to_index(pdf_paths, job=None):
+        return {"files": {
+            "good.pdf": {"status": "indexed", "chunks": 4},
+            "empty.pdf": {"status": "failed", "chunks": 0, "error": "No text could be extracted"},
+        }}
+
+    monkeypatch.setattr(service, "add_pdfs_to_index", add_pdfs_to_index)
+    job = IngestionJob(job_id="bulk", kind="bulk_upload", files=["good.pdf", "empty.pdf"])
+    result = service.run_bulk_job(job, paths)
+    assert result["files"]["good.pdf"] == {"status": "indexed", "chunks": 4}
+    assert job.errors == ["empty.pdf: No text could be extracted"]
+    assert os.listdir(service.PDF_FOLDER) == ["good.pdf"]
+    assert service.uploaded_hashes == {}
+
+    failed = IngestionJob(job_id="bulk", kind="bulk_upload", files=["empty.pdf"])
+    with pytest.raises(Exception, match="No uploaded file could be indexed"):
+        service.run_bulk_job(failed, [os.path.join(service.PDF_FOLDER, "empty.pdf")])
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from ann_index import VECTOR_INDEX_SETTINGS, build_index as build_vector_index, rescore_hits
+from conftest import HashEmbeddings, build_index
+from embedding_cache import CachedEmbeddings, EmbeddingCache, QueryEmbeddingCache, evict_models
+
+
+def cached_embeddings(tmp_path, model_name, dimension, max_entries=8):
+    return CachedEmbeddings(HashEmbeddings(dimension), EmbeddingCache(str(tmp_path), model_name),
+                            QueryEmbeddingCache(model_name, max_entries))
+
+
+def test_query_cache_is_a_bounded_lru():
+    cache = QueryEmbeddingCache("m", max_entries=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    assert cache.get("a").tolist() == [1.0]
+    cache.put("c", [3.0])  # Evicts b, the least recently used
+    assert cache.get("b") is None
+    assert len(cache) == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+    with pytest.raises(ValueError):
+        cache.get("a")[0] = 5.0  # Cached vectors are read-only
+
+
+def test_queries_are_normalized_and_encoded_once(tmp_path):
+    embeddings = cached_embeddings(tmp_path, "m", 16)
+    first = embeddings.embed_query("lead  status\u00a0reset")
+    assert embeddings.embed_query("lead status reset") == first
+    assert embeddings.embeddings.queries == 1
+    assert embeddings.embed_query("Lead status reset") != first  # Case is kept
+
+    disabled = CachedEmbeddings(HashEmbeddings(), EmbeddingCache(str(tmp_path), "m"), QueryEmbeddingCache("m", 0))
+    disabled.embed_query("x")
+    disabled.embed_query("x")
+    assert disabled.embeddings.queries == 2
+
+
+def test_switching_models_switches_query_caches_with_the_index(tmp_path):
+    texts = ["alpha apples orchard", "beta plums field"]
+    old = build_index({"a.pdf": ("aaaaaaaaaaaaaa", texts)}, cached_embeddings(tmp_path, "small", 16))
+    old.embeddings.embed_query("apples")
+    new = build_index({"a.pdf": ("aaaaaaaaaaaaaa", texts)}, cached_embeddings(tmp_path, "large", 24))
+
+    # Each bundle encodes queries with its own model and cache, so a cached
+    # vector never meets an index of another dimension
+    assert new.embeddings.query_cache is not old.embeddings.query_cache
+    vector = new.embeddings.embed_query("apples")
+    assert len(vector) == new.vector_store.index.d == 24
+    assert new.embeddings.query_cache.stats()["misses"] == 1
+    assert len(old.embeddings.embed_query("apples")) == old.vector_store.index.d == 16
+    assert old.embeddings.query_cache.stats()["hits"] == 1
+    top, score = new.search_by_vectors(np.asarray([new.embeddings.embed_documents([texts[0]])[0]]), 1)[0][0]
+    assert top.page_content == texts[0] and score == pytest.approx(1.0)
+
+
+def test_document_vectors_persist_per_model(tmp_path):
+    embeddings = cached_embeddings(tmp_path, "m", 16)
+    vectors = embeddings.embed_documents(["one", "two", "one"])
+    assert vectors[0] == vectors[2]
+    assert embeddings.embeddings.queries == 0
+
+    reloaded = EmbeddingCache(str(tmp_path), "m")
+    assert len(reloaded) == 2
+    assert np.allclose(reloaded.lookup(["two"])[0], vectors[1])
+    assert EmbeddingCache(str(tmp_path), "other").lookup(["two"]) == [None]
+
+    EmbeddingCache(str(tmp_path), "other").store(["two"], [vectors[1]])
+    assert evict_models(str(tmp_path), ["m"]) == ["other"]
+    assert len(EmbeddingCache(str(tmp_path), "m")) == 2
+
+
+def test_cached_vectors_are_mapped_and_survive_a_torn_append(tmp_path):
+    embeddings = cached_embeddings(tmp_path, "m", 16)
+    vectors = embeddings.embed_documents(["one", "two"])
+    cache = EmbeddingCache(str(tmp_path), "m")
+    assert cache.stats()["mapped_mb"] == round(2 * 16 * 4 / (1024 * 1024), 2)
+
+    # A crash mid-append leaves a partial vector and no key; it is cut off on load
+    with open(tmp_path / "m" / "vectors.bin", "ab") as f:
+        f.write(b"\0" * 10)
+    cache = EmbeddingCache(str(tmp_path), "m")
+    assert len(cache) == 2
+    cache.store(["three"], [[0.5] * 16])
+    reloaded = EmbeddingCache(str(tmp_path), "m")
+    two, three = reloaded.lookup(["two", "three"])
+    assert np.allclose(two, vectors[1]) and np.allclose(three, 0.5)
+    three[0] = 1.0  # Lookups are copies, not views of the read-only map
+
+
+def test_rescoring_compact_hits_with_cached_full_vectors(tmp_path):
+    texts = [f"chunk {i} about topic {i % 7}" for i in range(200)]
+    embeddings = cached_embeddings(tmp_path, "m", 16)
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    compact, _ = build_vector_index(vectors, {**VECTOR_INDEX_SETTINGS, "type": "flat", "compression": "int8", "pca_dim": 0})
+    cache = EmbeddingCache(str(tmp_path), "m")
+
+    query = vectors[:5] + 0.01
+    _, found = compact.search(query, 20)
+    candidates = [[(texts[i], 0.0) for i in row] for row in found]
+    rescored = rescore_hits(query, candidates, lambda docs: cache.lookup(docs, record_stats=False), 3)
+    exact = np.argsort(-(vectors @ (query / np.linalg.norm(query, axis=1, keepdims=True)).T), axis=0)[:3].T
+    assert [[text for text, _ in hits] for hits in rescored] == [[texts[i] for i in row] for row in exact]
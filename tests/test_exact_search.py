@@ -0,0 +1,130 @@
+import faiss
+import numpy as np
+import pytest
+
+import exact_search
+import rag_index
+from conftest import add_file, build_index
+from exact_search import ExactSearchIndex
+
+DIMENSION = 32
+
+
+def unit_vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def faiss_search(matrix, queries, k, excluded=()):
+    """Top k (row, score) pairs by FAISS exact inner product over the rows not excluded"""
+    index = faiss.IndexFlatIP(matrix.shape[1])
+    index.add(matrix)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores, rows = index.search(queries, min(k + len(excluded), len(matrix)))
+    return [
+        [(int(row), float(score)) for row, score in zip(row_ids, row_scores) if row not in excluded][:k]
+        for row_ids, row_scores in zip(rows, scores)
+    ]
+
+
+def assert_same_hits(found, expected, atol=1e-5):
+    assert len(found) == len(expected)
+    for hits, expected_hits in zip(found, expected):
+        assert [row for row, _ in hits] == [row for row, _ in expected_hits]
+        np.testing.assert_allclose([score for _, score in hits], [score for _, score in expected_hits], atol=atol)
+
+
+def test_exact_search_matches_faiss_flat():
+    matrix = unit_vectors(500)
+    queries = 3 * unit_vectors(20, seed=1)  # Queries need not be normalized
+    index = ExactSearchIndex(matrix, np.arange(len(matrix)))
+    assert_same_hits(index.search(queries, 10), faiss_search(matrix, queries, 10))
+
+    excluded = {row for hits in faiss_search(matrix, queries[:5], 3) for row, _ in hits}
+    found = index.search(queries, 10, index.rows_of(sorted(excluded)))
+    assert_same_hits(found, faiss_search(matrix, queries, 10, excluded))
+
+
+def test_exact_search_returns_fewer_hits_than_k_when_rows_run_out():
+    matrix = unit_vectors(5)
+    index = ExactSearchIndex(matrix, np.arange(5))
+    hits = index.search(unit_vectors(1, seed=1), 10, np.array([0, 3]))[0]
+    assert sorted(row for row, _ in hits) == [1, 2, 4]
+
+
+def test_half_precision_scores_match_faiss_across_blocks(monkeypatch):
+    monkeypatch.setattr(exact_search, "HALF_PRECISION_BLOCK_ROWS", 64)
+    matrix = unit_vectors(500)
+    queries = unit_vectors(20, seed=1)
+    index = ExactSearchIndex(matrix.astype(np.float16), np.arange(len(matrix)))
+    expected = faiss_search(matrix, queries, 10)
+    for hits, expected_hits in zip(index.search(queries, 10), expected):
+        # Rows may swap where float16 rounding reorders near-ties; scores agree to its precision
+        assert len({row for row, _ in hits} & {row for row, _ in expected_hits}) >= 9
+        np.testing.assert_allclose([score for _, score in hits], [score for _, score in expected_hits], atol=2e-3)
+
+
+# ============================================================================
+# RAGIndex: FAISS index, tombstones and appended vectors
+# ============================================================================
+
+def texts_of(source, count):
+    return [f"{source} chunk {i}" for i in range(count)]
+
+
+def reference_search(embeddings, live_texts, queries, k):
+    """Top k (text, score) pairs by FAISS over the embeddings of the live chunks only"""
+    matrix = np.asarray(embeddings.embed_documents(live_texts), dtype=np.float32)
+    return [[(live_texts[row], score) for row, score in hits] for hits in faiss_search(matrix, queries, k)]
+
+
+def assert_matches_reference(index, embeddings, live_texts, k=8):
+    queries = np.asarray(embeddings.embed_documents(live_texts[::7] + ["unrelated query"]), dtype=np.float32)
+    found = [[(doc.page_content, score) for doc, score in hits] for hits in index.search_by_vectors(queries, k)]
+    assert_same_hits(found, reference_search(embeddings, live_texts, queries, k))
+
+
+@pytest.fixture(params=["exact", "faiss"])
+def search_path(request, monkeypatch):
+    if request.param == "faiss":
+        monkeypatch.setattr(rag_index, "exact_index_for_store", lambda store: None)
+    return request.param
+
+
+def test_search_paths_match_faiss_with_tombstones_and_appended_vectors(embeddings, search_path):
+    files = {source: texts_of(source, 20) for source in ("a.pdf", "b.pdf", "c.pdf")}
+    index = build_index({source: (source * 3, texts) for source, texts in files.items()}, embeddings)
+    assert (index.exact_index is not None) == (search_path == "exact")
+    assert_matches_reference(index, embeddings, files["a.pdf"] + files["b.pdf"] + files["c.pdf"])
+
+    index = add_file(index, "d.pdf", "d" * 12, texts_of("d.pdf", 5), embeddings)
+    index = add_file(index, "e.pdf", "e" * 12, texts_of("e.pdf", 5), embeddings)
+    index = index.without_source("b.pdf").without_source("d.pdf")
+    assert len(index.appended) == 10 and len(index.tombstones) == 25
+    assert_matches_reference(index, embeddings, files["a.pdf"] + files["c.pdf"] + texts_of("e.pdf", 5))
+
+    compacted = index.compacted()
+    assert compacted.appended is None and compacted.vector_store.index.ntotal == 45
+    assert_matches_reference(compacted, embeddings, files["a.pdf"] + files["c.pdf"] + texts_of("e.pdf", 5))
+
+
+def test_appended_vectors_fold_at_a_tenth_of_the_faiss_index(embeddings, search_path, monkeypatch):
+    monkeypatch.setattr(rag_index, "APPEND_FOLD_MIN_VECTORS", 1)
+    corpus = texts_of("a.pdf", 100)
+    index = build_index({"a.pdf": ("a" * 12, corpus)}, embeddings)
+
+    below = add_file(index, "b.pdf", "b" * 12, texts_of("b.pdf", 9), embeddings)
+    assert len(below.appended) == 9 and below.vector_store.index.ntotal == 100
+    assert_matches_reference(below, embeddings, corpus + texts_of("b.pdf", 9))
+
+    # The tenth vector reaches APPEND_FOLD_RATIO of the 100 in FAISS
+    folded = add_file(below, "c.pdf", "c" * 12, texts_of("c.pdf", 1), embeddings)
+    assert folded.appended is None and folded.vector_store.index.ntotal == 110
+    assert (folded.exact_index is not None) == (search_path == "exact")
+    assert_matches_reference(folded, embeddings, corpus + texts_of("b.pdf", 9) + texts_of("c.pdf", 1))
+    folded = folded.without_source("b.pdf")
+    assert_matches_reference(folded, embeddings, corpus + texts_of("c.pdf", 1))
+
+    # Folding copies the FAISS index; the bundle it was derived from is unchanged
+    assert len(below.appended) == 9 and below.vector_store.index.ntotal == 100
+    assert_matches_reference(below, embeddings, corpus + texts_of("b.pdf", 9))
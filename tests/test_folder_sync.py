@@ -0,0 +1,188 @@
+import os
+
+import pytest
+
+import folder_watcher
+from conftest import build_index
+from folder_watcher import FolderWatcher
+from ingestion_jobs import IngestionJob
+
+
+def write(path, content, mtime=1_000):
+    with open(path, "wb") as f:
+        f.write(content)
+    # Signatures include the mtime; pin it so rewrites within one clock tick still differ by size only
+    os.utime(path, ns=(mtime, mtime))
+    return str(path)
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    # Tests drive poll() with their own clock; the callback only runs on the watcher thread
+    return FolderWatcher([str(tmp_path)], lambda changed, removed: None, interval=1.0, debounce=1.0)
+
+
+def test_primed_files_are_not_reported(tmp_path, watcher):
+    write(tmp_path / "a.pdf", b"a")
+    watcher.prime()
+    assert watcher.poll(0.0) == ([], [])
+    assert watcher.poll(5.0) == ([], [])
+
+
+def test_new_file_is_reported_once_it_has_settled(tmp_path, watcher):
+    watcher.prime()
+    path = write(tmp_path / "a.pdf", b"a")
+    assert watcher.poll(0.0) == ([], [])
+    assert watcher.poll(0.5) == ([], [])
+    assert watcher.poll(1.0) == ([path], [])
+    assert watcher.poll(2.0) == ([], [])
+
+
+def test_file_still_being_written_restarts_the_quiet_period(tmp_path, watcher):
+    watcher.prime()
+    path = write(tmp_path / "a.pdf", b"a")
+    assert watcher.poll(0.0) == ([], [])
+    write(path, b"aa")
+    assert watcher.poll(0.75) == ([], [])
+    write(path, b"aaa")
+    assert watcher.poll(1.5) == ([], [])
+    assert watcher.poll(2.25) == ([], [])
+    assert watcher.poll(2.5) == ([path], [])
+
+
+def test_burst_is_reported_as_one_batch(tmp_path, watcher):
+    watcher.prime()
+    first = write(tmp_path / "a.pdf", b"a")
+    assert watcher.poll(0.0) == ([], [])
+    second = write(tmp_path / "b.pdf", b"b")
+    # a.pdf has settled, but b.pdf is still within its quiet period
+    assert watcher.poll(1.0) == ([], [])
+    assert watcher.poll(2.0) == ([first, second], [])
+
+
+def test_settled_changes_wait_at_most_max_batch_delay(tmp_path, watcher, monkeypatch):
+    monkeypatch.setattr(folder_watcher, "MAX_BATCH_DELAY", 5.0)
+    watcher.prime()
+    settled = write(tmp_path / "a.pdf", b"a")
+    growing = write(tmp_path / "b.pdf", b"b")
+    assert watcher.poll(0.0) == ([], [])
+    for step in range(1, 5):
+        write(growing, b"b" * (step + 1))
+        assert watcher.poll(float(step)) == ([], [])
+    write(growing, b"b" * 6)
+    assert watcher.poll(5.0) == ([settled], [])
+
+
+def test_removal_is_reported_and_reverted_changes_are_not(tmp_path, watcher):
+    kept = write(tmp_path / "a.pdf", b"a")
+    removed = write(tmp_path / "b.pdf", b"b")
+    watcher.prime()
+    os.remove(removed)
+    write(kept, b"changed")
+    assert watcher.poll(0.0) == ([], [])
+    write(kept, b"a")  # Back to the primed signature before it settled
+    assert watcher.poll(1.0) == ([], [removed])
+    assert watcher.poll(3.0) == ([], [])
+    assert watcher.stats()["pending_changes"] == 0
+
+
+def test_hidden_and_non_pdf_files_are_ignored(tmp_path, watcher):
+    watcher.prime()
+    write(tmp_path / ".a.pdf.replace", b"a")
+    write(tmp_path / ".upload-1.part", b"a")
+    write(tmp_path / "notes.txt", b"a")
+    assert watcher.poll(0.0) == ([], [])
+    assert watcher.poll(2.0) == ([], [])
+
+
+def test_watcher_thread_hands_batches_to_the_callback(tmp_path):
+    batches = []
+    watcher = FolderWatcher([str(tmp_path)], lambda changed, removed: batches.append((changed, removed)),
+                            interval=0.01, debounce=0.0)
+    watcher.prime()
+    path = write(tmp_path / "a.pdf", b"a")
+    watcher.start()
+    try:
+        for _ in range(500):
+            if batches:
+                break
+            watcher._stop.wait(0.01)
+    finally:
+        watcher.stop()
+    assert batches[0] == ([path], [])
+    assert not watcher.stats()["running"]
+
+
+# ============================================================================
+# Sync jobs
+# ============================================================================
+
+def sync_job(changed, removed):
+    return IngestionJob(job_id="sync", kind="sync", files=[os.path.basename(p) for p in changed + removed])
+
+
+@pytest.fixture
+def synced(service, embeddings, monkeypatch):
+    """service with an index and stand-ins for indexing that fail for bad*.pdf and for files in media/"""
+    service.rag_index = build_index({"a.pdf": ("a" * 12, ["alpha"])}, embeddings)
+    calls = []
+
+    def add_pdf_to_index(pdf_path, job=None, source=None):
+        calls.append(("add", pdf_path))
+        if os.path.basename(os.path.dirname(pdf_path)) == "media" or "bad" in pdf_path:
+            raise ValueError("cannot be parsed")
+        return 3
+
+    def remove_pdf_from_index(source):
+        calls.append(("remove", source))
+        return 2
+
+    monkeypatch.setattr(service, "add_pdf_to_index", add_pdf_to_index)
+    monkeypatch.setattr(service, "remove_pdf_from_index", remove_pdf_from_index)
+    return service, calls
+
+
+def test_sync_job_reports_each_file_and_continues_past_failures(synced):
+    service, calls = synced
+    pdfs, media = service.CORPUS_DIRS
+    good = write(os.path.join(pdfs, "good.pdf"), b"g")
+    bad = write(os.path.join(pdfs, "bad.pdf"), b"b")
+    shadowed = write(os.path.join(media, "good.pdf"), b"s")
+    vanished = os.path.join(pdfs, "vanished.pdf")
+    # moved.pdf was removed from pdfs/ but a copy in media/ keeps the name; re-indexing it fails
+    moved = os.path.join(pdfs, "moved.pdf")
+    write(os.path.join(media, "moved.pdf"), b"m")
+    deleted = os.path.join(pdfs, "deleted.pdf")
+
+    job = sync_job([good, bad, shadowed, vanished], [moved, deleted])
+    result = service.run_sync_job(job, [good, bad, shadowed, vanished], [moved, deleted])
+
+    files = result["files"]
+    assert files[good] == {"status": "indexed", "chunks": 3}
+    assert files[bad] == {"status": "failed", "error": "cannot be parsed"}
+    assert files[shadowed]["status"] == "skipped"
+    assert files[vanished]["status"] == "missing"
+    assert files[moved] == {"status": "failed", "error": "cannot be parsed"}
+    assert files[deleted] == {"status": "removed", "chunks": 2}
+    assert (result["chunks_added"], result["chunks_removed"]) == (3, 2)
+    assert job.files_done == 6
+    assert sorted(error.split(":")[0] for error in job.errors) == sorted([bad, shadowed, moved])
+    assert ("remove", "deleted.pdf") in calls
+
+
+def test_sync_job_fails_when_no_file_could_be_synced(synced):
+    service, _ = synced
+    bad = write(os.path.join(service.PDF_FOLDER, "bad.pdf"), b"b")
+    job = sync_job([bad], [])
+    with pytest.raises(Exception, match="No changed file could be synced"):
+        service.run_sync_job(job, [bad], [])
+    assert job.errors == [f"{bad}: cannot be parsed"]
+
+
+def test_sync_job_forgets_hashes_of_removed_uploads(synced):
+    service, _ = synced
+    removed = os.path.join(service.PDF_FOLDER, "upload.pdf")
+    kept = os.path.join(service.PDF_FOLDER, "other.pdf")
+    service.uploaded_hashes.update({"1" * 64: removed, "2" * 64: kept})
+    service.run_sync_job(sync_job([], [removed]), [], [removed])
+    assert service.uploaded_hashes == {"2" * 64: kept}
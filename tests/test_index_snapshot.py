@@ -0,0 +1,122 @@
+import dataclasses
+import os
+
+import numpy as np
+import pytest
+
+from conftest import add_file, build_index
+from index_snapshot import MANIFEST_FILE, build_manifest, file_sha256, load_snapshot, save_snapshot
+from keyword_fts import FTSKeywordIndex
+
+CHUNKING = {"chunk_size": 200, "chunk_overlap": 20}
+VECTOR_INDEX = {"type": "flat"}
+TEXTS = {
+    "a.pdf": ["alpha apples orchard", "alpha bananas grove"],
+    "b.pdf": [f"beta {fruit} field" for fruit in ("cherries", "plums", "figs", "limes", "pears", "grapes")],
+    "c.pdf": ["gamma dates meadow", "gamma figs meadow"],
+}
+
+
+def write_pdf(folder, name, content):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def expected_manifest(paths, embedding_model="model-a", keyword_backend="memory"):
+    return build_manifest(paths, embedding_model, CHUNKING, VECTOR_INDEX, keyword_backend)
+
+
+def with_parameters(index, manifest):
+    """Bundle whose manifest also records the parameters, as a full build's does"""
+    parameters = {key: value for key, value in manifest.items() if key != "files"}
+    return dataclasses.replace(index, manifest=dict(index.manifest, **parameters))
+
+
+def hits(index, embeddings, text):
+    query = np.asarray([embeddings.embed_query(text)], dtype=np.float32)
+    semantic = [(doc.metadata["chunk_id"], round(score, 5)) for doc, score in index.search_by_vectors(query, 5)[0]]
+    keyword = [(hit.chunk_id, round(hit.score, 5)) for hit in index.keyword_search(text, 5)]
+    return semantic, keyword
+
+
+@pytest.fixture(params=["memory", "fts5"])
+def corpus(request, tmp_path, embeddings):
+    """Index of a.pdf and b.pdf with c.pdf appended and b.pdf deleted, and its expected manifest"""
+    folder = tmp_path / "pdfs"
+    folder.mkdir()
+    paths = {name: write_pdf(str(folder), name, f"%PDF {name}".encode()) for name in TEXTS}
+    keyword_index = FTSKeywordIndex.create(str(tmp_path / "fts")) if request.param == "fts5" else None
+    index = build_index({name: (file_sha256(paths[name]), TEXTS[name]) for name in ("a.pdf", "b.pdf")},
+                        embeddings, keyword_index=keyword_index)
+    index = add_file(index, "c.pdf", file_sha256(paths["c.pdf"]), TEXTS["c.pdf"], embeddings)
+    index = index.without_source("b.pdf")
+    os.remove(paths.pop("b.pdf"))
+    manifest = expected_manifest(list(paths.values()), keyword_backend=request.param)
+    return with_parameters(index, manifest), manifest, paths
+
+
+def test_snapshot_round_trip(tmp_path, embeddings, corpus):
+    index, manifest, _ = corpus
+    snapshot_dir = str(tmp_path / "snapshot")
+    save_snapshot(snapshot_dir, index)
+    loaded = load_snapshot(snapshot_dir, embeddings, manifest)
+
+    assert loaded is not None
+    assert loaded.tombstones == index.tombstones
+    assert loaded.num_chunks == index.num_chunks == 4
+    assert loaded.manifest["files"] == manifest["files"]
+    # Appended vectors are folded into the saved FAISS index
+    assert loaded.appended is None
+    assert loaded.vector_store.index.ntotal == index.vector_store.index.ntotal + len(index.appended)
+    for text in ("gamma figs meadow", "alpha apples", "beta plums field"):
+        assert hits(loaded, embeddings, text) == hits(index, embeddings, text)
+
+
+def test_saving_again_replaces_the_snapshot(tmp_path, embeddings, corpus):
+    index, manifest, _ = corpus
+    snapshot_dir = str(tmp_path / "snapshot")
+    save_snapshot(snapshot_dir, index)
+    save_snapshot(snapshot_dir, index.without_source("c.pdf"))
+    loaded = load_snapshot(snapshot_dir, embeddings, dict(manifest, files={"a.pdf": manifest["files"]["a.pdf"]}))
+    assert loaded is not None and not loaded.has_source("c.pdf")
+    # No staging or backup directory is left behind
+    assert not [name for name in os.listdir(tmp_path) if ".tmp-" in name or ".old-" in name]
+
+
+def test_snapshot_of_a_changed_file_is_stale(tmp_path, embeddings, corpus):
+    index, manifest, paths = corpus
+    snapshot_dir = str(tmp_path / "snapshot")
+    save_snapshot(snapshot_dir, index)
+
+    write_pdf(os.path.dirname(paths["c.pdf"]), "c.pdf", b"%PDF c.pdf, second version")
+    stale = expected_manifest(list(paths.values()), keyword_backend=manifest["keyword_backend"])
+    assert stale["files"]["c.pdf"] != manifest["files"]["c.pdf"]
+    assert load_snapshot(snapshot_dir, embeddings, stale) is None
+
+    # A file added to or missing from the corpus makes it stale too
+    extra = write_pdf(os.path.dirname(paths["a.pdf"]), "d.pdf", b"%PDF d.pdf")
+    assert load_snapshot(snapshot_dir, embeddings, dict(manifest, files=dict(manifest["files"], **{
+        "d.pdf": file_sha256(extra)}))) is None
+    assert load_snapshot(snapshot_dir, embeddings, dict(manifest, files={"a.pdf": manifest["files"]["a.pdf"]})) is None
+
+
+def test_snapshot_of_another_embedding_model_or_settings_is_stale(tmp_path, embeddings, corpus):
+    index, manifest, _ = corpus
+    snapshot_dir = str(tmp_path / "snapshot")
+    save_snapshot(snapshot_dir, index)
+    assert load_snapshot(snapshot_dir, embeddings, dict(manifest, embedding_model="model-b")) is None
+    assert load_snapshot(snapshot_dir, embeddings, dict(manifest, chunking=dict(CHUNKING, chunk_size=400))) is None
+    assert load_snapshot(snapshot_dir, embeddings, dict(manifest, snapshot_version=0)) is None
+    assert load_snapshot(snapshot_dir, embeddings, manifest) is not None
+
+
+def test_snapshot_without_a_manifest_is_not_loaded(tmp_path, embeddings, corpus):
+    index, manifest, _ = corpus
+    snapshot_dir = str(tmp_path / "snapshot")
+    assert load_snapshot(snapshot_dir, embeddings, manifest) is None
+    save_snapshot(snapshot_dir, index)
+    # The manifest is written last; a snapshot interrupted before it never validates
+    os.remove(os.path.join(snapshot_dir, MANIFEST_FILE))
+    assert load_snapshot(snapshot_dir, embeddings, manifest) is None
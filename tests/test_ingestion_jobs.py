@@ -0,0 +1,109 @@
+import threading
+
+import ingestion_jobs
+from ingestion_jobs import IngestionQueue
+
+
+def test_after_job_hook_reports_when_the_queue_goes_idle():
+    calls, release, done = [], threading.Event(), threading.Event()
+
+    def after_job(job, idle):
+        calls.append((job.kind, idle))
+        if idle:
+            done.set()
+
+    queue = IngestionQueue(after_job=after_job)
+    queue.submit("first", [], lambda job: release.wait(5) and {})
+    queue.submit("second", [], lambda job: {})
+    queue.submit("third", [], lambda job: {})
+    release.set()
+    assert done.wait(5)
+    # Only the last job of the burst finds the queue empty
+    assert calls == [("first", False), ("second", False), ("third", True)]
+
+
+def wait_for(job, timeout=5.0):
+    pause = threading.Event()
+    while job.finished_at is None:
+        timeout -= 0.01
+        assert timeout > 0 and not pause.wait(0.01), f"job {job.kind} did not finish"
+    return job
+
+
+def test_job_moves_from_queued_to_running_to_succeeded():
+    started, release = threading.Event(), threading.Event()
+    seen = {}
+
+    def task(job):
+        seen["status"] = job.status
+        job.files_done = 1
+        job.errors.append("b.pdf: no text")  # A per-file problem does not fail the job
+        started.set()
+        release.wait(5)
+        return {"chunks": 3}
+
+    queue = IngestionQueue()
+    job = queue.submit("upload", ["a.pdf", "b.pdf"], task)
+    waiting = queue.submit("upload", ["c.pdf"], lambda job: {})
+    assert started.wait(5)
+    assert (job.status, waiting.status) == ("running", "queued")
+    assert job.started_at is not None and job.finished_at is None
+    release.set()
+
+    wait_for(waiting)
+    assert seen["status"] == "running"
+    assert (job.status, job.result, job.errors) == ("succeeded", {"chunks": 3}, ["b.pdf: no text"])
+    assert job.finished_at >= job.started_at and job.elapsed_seconds > 0
+    report = job.to_dict()
+    assert report["progress"]["files_done"] == 1 and report["progress"]["files_total"] == 2
+    assert queue.get(job.job_id) is job and queue.pending() == 0
+
+
+def test_failed_job_records_its_error_and_the_worker_keeps_going():
+    def fail(job):
+        job.errors.append("a.pdf: unreadable")
+        raise ValueError("nothing could be indexed")
+
+    queue = IngestionQueue()
+    failed = queue.submit("upload", ["a.pdf"], fail)
+    following = wait_for(queue.submit("delete", ["b.pdf"], lambda job: None))
+    assert failed.status == "failed"
+    assert failed.errors == ["a.pdf: unreadable", "nothing could be indexed"]
+    assert failed.result == {} and failed.finished_at is not None
+    # A task returning None succeeds with an empty result
+    assert (following.status, following.result) == ("succeeded", {})
+
+
+def test_jobs_run_one_at_a_time_in_submission_order():
+    order, running, overlaps = [], [0], []
+
+    def task(name):
+        def run(job):
+            running[0] += 1
+            overlaps.append(running[0])
+            order.append(name)
+            running[0] -= 1
+        return run
+
+    queue = IngestionQueue()
+    jobs = [queue.submit("sync", [], task(i)) for i in range(20)]
+    wait_for(jobs[-1])
+    assert order == list(range(20)) and max(overlaps) == 1
+
+
+def test_failing_after_job_hook_does_not_stop_the_worker():
+    def after_job(job, idle):
+        raise RuntimeError("snapshot disk full")
+
+    queue = IngestionQueue(after_job=after_job)
+    first = wait_for(queue.submit("upload", [], lambda job: {}))
+    second = wait_for(queue.submit("upload", [], lambda job: {}))
+    assert (first.status, second.status) == ("succeeded", "succeeded")
+
+
+def test_only_the_newest_finished_jobs_are_kept(monkeypatch):
+    monkeypatch.setattr(ingestion_jobs, "MAX_FINISHED_JOBS", 2)
+    queue = IngestionQueue()
+    jobs = [queue.submit("upload", [], lambda job: {}) for _ in range(4)]
+    queue._queue.join()  # Every job retired
+    assert [queue.get(job.job_id) for job in jobs] == [None, None, jobs[2], jobs[3]]
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+
+from conftest import add_file, build_index
+from keyword_fts import FTSKeywordIndex, evict_databases
+
+TEXTS = ["alpha apples orchard", "alpha bananas grove"] + [
+    f"beta {fruit} field" for fruit in ("cherries", "plums", "figs", "limes", "pears", "grapes", "melons", "olives")
+]
+
+
+def fts_index(tmp_path, texts, start=0):
+    index = FTSKeywordIndex.create(str(tmp_path))
+    index.add_documents(texts, list(range(start, start + len(texts))))
+    return index
+
+
+def scores(index, query, excluded=None):
+    return {key: round(score, 6) for key, score in index.search(query, 20, excluded)}
+
+
+def test_scores_are_fts5_bm25(tmp_path):
+    index = fts_index(tmp_path, TEXTS)
+    connection = sqlite3.connect(index.path)
+    expected = {
+        key: round(-rank, 6) for key, rank in connection.execute(
+            "SELECT rowid, bm25(chunks) FROM chunks WHERE chunks MATCH ?", ('"alpha" OR "grove" OR "field"',)
+        )
+    }
+    assert scores(index, "Alpha grove, field!") == expected
+    assert [key for key, _ in index.search("alpha bananas", 1)] == [1]
+
+
+def test_statistics_only_count_rows_a_bundle_sees(tmp_path):
+    index = fts_index(tmp_path, TEXTS)
+    before = scores(index, "alpha")
+
+    # A newer bundle's rows, and rows of an update that was never published, do not change older scores
+    newer = index.copy()
+    newer.add_documents(["alpha dates meadow"] * 5, [20, 21, 22, 23, 24])
+    assert scores(index, "alpha") == before
+    assert set(scores(newer, "alpha")) == {0, 1, 20, 21, 22, 23, 24}
+
+    # Tombstoned rows are left out of the statistics as well as the results
+    tombstoned = scores(newer, "alpha", newer.exclusion([20, 21, 22, 23, 24]))
+    assert tombstoned == before
+
+    # The next writer drops the unpublished rows
+    rewritten = index.copy()
+    rewritten.add_documents(["gamma kiwis patch"], [20])
+    assert set(scores(rewritten, "alpha")) == {0, 1} and set(scores(rewritten, "kiwis")) == {20}
+    assert rewritten.num_docs == len(TEXTS) + 1
+
+
+def test_removal_copies_rows_so_older_bundles_keep_theirs(tmp_path):
+    index = fts_index(tmp_path, TEXTS)
+    tombstoned = index.exclusion([0])
+    expected = scores(index, "alpha apples", tombstoned)
+
+    compacted = index.without([0])
+    assert compacted.path != index.path
+    assert scores(compacted, "alpha apples") == expected
+    assert set(scores(index, "alpha apples")) == {0, 1}  # The older bundle still finds the removed row
+
+    # Re-adding after compaction appends to the new file only
+    readded = compacted.copy()
+    readded.add_documents(["alpha apples orchard"], [10])
+    assert set(scores(readded, "apples")) == {10}
+    assert set(scores(compacted, "apples")) == set()
+    assert set(scores(index, "apples")) == {0}
+
+    evict_databases(str(tmp_path), [compacted.path])
+    assert not os.path.exists(index.path) and os.path.exists(compacted.path)
+    assert set(scores(readded, "apples")) == {10}
+
+
+def test_fts5_bundles_across_delete_compact_and_re_add(tmp_path, embeddings):
+    files = {"a.pdf": ("aaaaaaaaaaaaaa", TEXTS[:2]), "b.pdf": ("bbbbbbbbbbbbbb", TEXTS[2:])}
+    published = build_index(files, embeddings, keyword_index=FTSKeywordIndex.create(str(tmp_path)))
+    deleted = published.without_source("a.pdf")
+    compacted = deleted.compacted()
+    readded = add_file(compacted, "a.pdf", "aaaaaaaaaaaaaa", TEXTS[:2], embeddings)
+
+    def sources(index):
+        return sorted(hit.metadata["source"] for hit in index.keyword_search("alpha", 10))
+
+    # Two live bundles over different database files, each with its own hits
+    assert sources(published) == ["a.pdf", "a.pdf"]
+    assert sources(deleted) == sources(compacted) == []
+    assert sources(readded) == ["a.pdf", "a.pdf"]
+    assert readded.bm25_index.path == compacted.bm25_index.path != published.bm25_index.path
+    beta = {hit.chunk_id: round(hit.score, 6) for hit in deleted.keyword_search("beta field", 10)}
+    assert {hit.chunk_id: round(hit.score, 6) for hit in compacted.keyword_search("beta field", 10)} == beta
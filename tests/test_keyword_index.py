@@ -0,0 +1,58 @@
+import numpy as np
+
+from keyword_index import MAX_SEGMENTS, IncrementalBM25, tokenize
+
+TEXTS = [f"chunk{i} common term{i % 7} group{i % 3} rare{i // 20}" for i in range(60)]
+QUERIES = ["term3", "group1 term5", "common", "rare0 term2", "rare2", "missing"]
+
+
+def build(texts, keys):
+    index = IncrementalBM25()
+    index.add_documents(texts, keys)
+    return index
+
+
+def assert_same_scores(index, expected):
+    assert index.keys.tolist() == expected.keys.tolist()
+    for query in QUERIES:
+        np.testing.assert_allclose(index.get_scores(tokenize(query)), expected.get_scores(tokenize(query)), rtol=1e-6)
+
+
+def test_appending_in_batches_scores_like_one_build():
+    index = IncrementalBM25()
+    for start in range(0, len(TEXTS), 4):
+        index.add_documents(TEXTS[start:start + 4], list(range(start, start + 4)))
+        sizes = [segment.num_docs for segment in index.segments]
+        assert sum(sizes) == index.corpus_size
+        assert len(sizes) <= MAX_SEGMENTS
+        # Newer segments are strictly smaller, so merges stay logarithmic
+        assert all(older > newer for older, newer in zip(sizes, sizes[1:]))
+    assert_same_scores(index, build(TEXTS, list(range(len(TEXTS)))))
+
+
+def test_copy_leaves_the_original_unchanged():
+    index = build(TEXTS[:30], list(range(30)))
+    clone = index.copy()
+    clone.add_documents(TEXTS[30:], list(range(30, 60)))
+    assert_same_scores(index, build(TEXTS[:30], list(range(30))))
+    assert_same_scores(clone, build(TEXTS, list(range(60))))
+
+
+def test_without_matches_a_build_of_the_remaining_documents():
+    index = IncrementalBM25()
+    for start in range(0, len(TEXTS), 6):
+        index.add_documents(TEXTS[start:start + 6], list(range(start, start + 6)))
+    removed = set(range(20, 40))  # Every document with rare1
+    remaining = [key for key in range(len(TEXTS)) if key not in removed]
+    pruned = index.without(removed)
+    assert "rare1" not in pruned.df
+    assert len(pruned.segments) == 1
+    assert_same_scores(pruned, build([TEXTS[key] for key in remaining], remaining))
+
+
+def test_search_returns_keys_and_skips_excluded():
+    index = build(TEXTS, [key * 10 for key in range(len(TEXTS))])
+    hits = index.search("rare2 term4", 3)
+    assert hits[0][0] in {key * 10 for key in range(40, 60) if key % 7 == 4}
+    excluded = index.exclusion([hit[0] for hit in hits])
+    assert not {key for key, _ in index.search("rare2 term4", 3, excluded)} & {key for key, _ in hits}
@@ -0,0 +1,45 @@
+import pytest
+
+from model_registry import ModelRegistry
+
+
+class Model:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_staged_model_is_current_only_once_installed():
+    registry = ModelRegistry()
+    old = registry.get("embeddings", "old", lambda: Model("old"))
+    staged = registry.load("embeddings", "new", lambda: Model("new"))
+    assert registry.current_name("embeddings") == "old"
+    assert not old.closed
+
+    assert registry.install(staged).name == "new"
+    assert registry.current_name("embeddings") == "new"
+    assert old.closed
+    assert registry.swaps == 1
+
+
+def test_discarded_model_leaves_the_current_one():
+    registry = ModelRegistry()
+    old = registry.get("embeddings", "old", lambda: Model("old"))
+    staged = registry.load("embeddings", "new", lambda: Model("new"))
+    new = staged.model
+    registry.discard(staged)
+    assert new.closed and not old.closed
+    assert registry.get("embeddings", "old", lambda: Model("other")) is old
+
+
+def test_get_rejects_a_different_name_and_swap_replaces():
+    registry = ModelRegistry()
+    old = registry.get("reranker", "a", lambda: Model("a"))
+    with pytest.raises(ValueError):
+        registry.get("reranker", "b", lambda: Model("b"))
+    assert registry.swap("reranker", "a", lambda: Model("a2")) is old
+    assert registry.swap("reranker", "b", lambda: Model("b")).name == "b"
+    assert old.closed
@@ -0,0 +1,58 @@
+import hashlib
+import random
+
+from near_duplicates import NearDuplicateIndex, simhash
+
+TEXT = "the quarterly lead report lists every open lead with its owner status and next follow up date"
+
+
+def test_finds_signatures_within_max_distance():
+    index = NearDuplicateIndex(3)
+    signature = simhash(TEXT)
+    index.add("a:1", signature)
+    assert index.find(signature ^ 0b101) == "a:1"
+    assert index.find(signature ^ 0b1111) is None
+    assert index.find(signature, is_live=lambda chunk_id: False) is None
+
+
+def test_copies_do_not_see_each_others_signatures():
+    index = NearDuplicateIndex(3)
+    index.add("a:1", simhash(TEXT))
+    extended = index.copy()
+    extended.add("b:1", 12345)
+    assert index.find(12345) is None and extended.find(12345) == "b:1"
+
+    # Extending the older index again starts a branch that does not see b:1
+    branch = index.copy()
+    branch.add("c:1", 12345)
+    assert branch.find(12345) == "c:1"
+    assert extended.find(12345) == "b:1"
+    assert index.find(12345) is None
+    assert branch.find(simhash(TEXT)) == "a:1"
+
+    pruned = extended.without({"a:1"})
+    assert pruned.find(simhash(TEXT)) is None and pruned.find(12345) == "b:1"
+
+
+def reference_simhash(text):
+    """Bit-by-bit SimHash the vectorized one must agree with"""
+    tokens = text.lower().split()
+    if len(tokens) < 12:
+        return None
+    weights = [0] * 64
+    for i in range(len(tokens) - 2):
+        shingle = " ".join(tokens[i:i + 3])
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def test_simhash_matches_the_bitwise_definition():
+    rng = random.Random(7)
+    words = [f"word{i}" for i in range(40)]
+    texts = [TEXT, " ".join(["same"] * 20)] + [
+        " ".join(rng.choice(words) for _ in range(rng.randint(8, 120))) for _ in range(200)
+    ]
+    for text in texts:
+        assert simhash(text) == reference_simhash(text)
@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+from pdf_backends import get_backend
+
+PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "media", "pdfs",
+                   "Leads_Management_Guide.pdf")
+
+
+def test_pdfminer_pages_match_extract_text():
+    high_level = pytest.importorskip("pdfminer.high_level")
+    backend = get_backend("pdfminer")
+    pages = list(backend.iter_pages(PDF))
+    assert [number for number, _ in pages] == list(range(1, backend.page_count(PDF) + 1))
+    assert [text for _, text in pages] == [high_level.extract_text(PDF, page_numbers=[i]) for i in range(len(pages))]
+    assert list(backend.iter_pages(PDF, 1, 3)) == pages[1:3]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        get_backend("nope")
@@ -0,0 +1,91 @@
+import gzip
+import os
+
+import pytest
+
+from page_text_cache import PageTextCache
+from pdf_extraction import EXTRACTOR_VERSION, iter_extracted_pdfs, iter_pdf_pages
+
+PDF_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "media", "pdfs")
+GUIDE = os.path.join(PDF_DIR, "Leads_Management_Guide.pdf")
+LIFECYCLE = os.path.join(PDF_DIR, "Lead_Lifecycle_Process_in_Studynet_CRM.pdf")
+HASHES = {GUIDE: "a" * 64, LIFECYCLE: "b" * 64}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PageTextCache(str(tmp_path), EXTRACTOR_VERSION)
+
+
+def extract(paths, cache, **kwargs):
+    results = []
+    for extraction in iter_extracted_pdfs(paths, cache=cache, file_hashes=HASHES, **kwargs):
+        results.append((extraction, [text for _, text in extraction.iter_pages()]))
+    return results
+
+
+def cache_files(cache):
+    return sorted(name for _, _, names in os.walk(cache.path) for name in names)
+
+
+def test_pages_are_cached_while_streaming_and_read_back(cache):
+    expected = [text for _, text in iter_pdf_pages(GUIDE)]
+    [(extraction, pages)] = extract([GUIDE], cache, max_workers=1)
+    assert pages == expected and not extraction.cached
+    assert cache_files(cache) == [f"{HASHES[GUIDE]}.jsonl.gz"]
+
+    [(extraction, pages)] = extract([GUIDE], cache, max_workers=1)
+    assert pages == expected
+    assert extraction.cached and extraction.num_pages == len(expected)
+    assert extraction.char_count == sum(len(text) for text in expected)
+    assert cache.stats()["hits"] == 1
+
+
+def test_abandoned_extraction_leaves_no_entry(cache):
+    [extraction] = iter_extracted_pdfs([GUIDE], max_workers=1, cache=cache, file_hashes=HASHES)
+    pages = extraction.iter_pages()
+    next(pages)
+    pages.close()
+    assert cache_files(cache) == []
+
+
+def test_unreadable_entry_falls_back_to_the_file(cache):
+    expected = [text for _, text in iter_pdf_pages(GUIDE)]
+    extract([GUIDE], cache, max_workers=1)
+    entry = os.path.join(cache.path, HASHES[GUIDE][:2], f"{HASHES[GUIDE]}.jsonl.gz")
+    with gzip.open(entry, "rt", encoding="utf-8") as f:
+        first_line = f.readline()
+    with gzip.open(entry, "wt", encoding="utf-8") as f:
+        f.write(first_line + "not json\n")
+
+    [(extraction, pages)] = extract([GUIDE], cache, max_workers=1)
+    assert pages == expected
+    assert not extraction.cached and extraction.error is None
+    assert extraction.num_pages == len(expected)
+    assert not os.path.exists(entry)
+
+
+def test_parallel_extraction_matches_sequential(cache, monkeypatch):
+    monkeypatch.setattr("pdf_extraction.TASKS_IN_FLIGHT_PER_WORKER", 1)
+    sequential = [pages for _, pages in extract([GUIDE, LIFECYCLE], None, max_workers=1)]
+    parallel = extract([GUIDE, LIFECYCLE], cache, max_workers=2, pages_per_task=3)
+    assert [pages for _, pages in parallel] == sequential
+    assert [extraction.num_pages for extraction, _ in parallel] == [len(pages) for pages in sequential]
+    assert [pages for _, pages in extract([GUIDE, LIFECYCLE], cache, max_workers=2)] == sequential
+
+
+def test_pool_results_read_late_still_have_every_page(cache):
+    sequential = [pages for _, pages in extract([GUIDE, LIFECYCLE], None, max_workers=1)]
+
+    # Results requested before their pages are read give up their ranges and parse the rest themselves
+    results = iter_extracted_pdfs([GUIDE, LIFECYCLE], max_workers=2, pages_per_task=3, cache=cache, file_hashes=HASHES)
+    first = next(results)
+    first_pages = first.iter_pages()
+    head = [text for _, (_, text) in zip(range(4), first_pages)]
+    second = next(results)
+    assert head + [text for _, text in first_pages] == sequential[0]
+    assert [text for _, text in second.iter_pages()] == sequential[1]
+    assert next(results, None) is None
+
+    late = list(iter_extracted_pdfs([GUIDE, LIFECYCLE], max_workers=2, pages_per_task=3))
+    assert [[text for _, text in extraction.iter_pages()] for extraction in late] == sequential
@@ -0,0 +1,143 @@
+import numpy as np
+
+import rag_index
+from conftest import add_file, build_index
+
+A_TEXTS = ["alpha apples orchard", "alpha bananas grove"]
+# Enough other chunks that query terms in a few chunks get a positive BM25 IDF
+B_TEXTS = [f"beta {fruit} field" for fruit in ("cherries", "plums", "figs", "limes", "pears", "grapes", "melons", "olives")]
+
+
+def keyword_sources(index, query):
+    return sorted(hit.metadata["source"] for hit in index.keyword_search(query, 10))
+
+
+def semantic_sources(index, embeddings, text, k=10):
+    query = np.asarray([embeddings.embed_query(text)], dtype=np.float32)
+    return sorted(doc.metadata["source"] for doc, _ in index.search_by_vectors(query, k)[0])
+
+
+def top_chunk(index, embeddings, text):
+    query = np.asarray([embeddings.embed_query(text)], dtype=np.float32)
+    document, score = index.search_by_vectors(query, 1)[0][0]
+    return document.page_content, round(score, 4)
+
+
+def corpus(embeddings):
+    return build_index({"a.pdf": ("aaaaaaaaaaaaaa", A_TEXTS), "b.pdf": ("bbbbbbbbbbbbbb", B_TEXTS)}, embeddings)
+
+
+def test_add_and_remove_round_trip(embeddings):
+    index = add_file(corpus(embeddings), "c.pdf", "cccccccccccccc", ["gamma dates meadow"], embeddings)
+    assert index.num_chunks == 11
+    assert keyword_sources(index, "gamma") == ["c.pdf"]
+
+    index = index.without_source("a.pdf")
+    assert index.num_chunks == 9
+    assert not index.has_source("a.pdf")
+    assert keyword_sources(index, "alpha") == []
+    assert "a.pdf" not in semantic_sources(index, embeddings, A_TEXTS[0])
+
+    compacted = index.compacted()
+    assert not compacted.tombstones
+    assert len(compacted.chunks) == 9
+    assert compacted.vector_store.index.ntotal == 9
+    assert keyword_sources(compacted, "gamma") == ["c.pdf"]
+    assert semantic_sources(compacted, embeddings, "gamma dates meadow") == ["b.pdf"] * 8 + ["c.pdf"]
+
+
+def test_published_index_is_not_changed_by_derived_ones(embeddings):
+    index = corpus(embeddings)
+    derived = add_file(index, "c.pdf", "cccccccccccccc", ["gamma dates meadow"], embeddings).without_source("a.pdf")
+    derived.compacted()
+    assert index.num_chunks == 10
+    assert keyword_sources(index, "alpha") == ["a.pdf", "a.pdf"]
+    assert index.vector_store.index.ntotal == 10
+
+
+def test_re_adding_deleted_content_gets_new_chunk_ids(embeddings):
+    index = corpus(embeddings)
+    old_ids = set(index.source_chunk_ids("a.pdf"))
+    index = add_file(index.without_source("a.pdf"), "a.pdf", "aaaaaaaaaaaaaa", A_TEXTS, embeddings)
+    assert old_ids <= index.tombstones
+    assert not old_ids & set(index.source_chunk_ids("a.pdf"))
+    assert keyword_sources(index, "alpha") == ["a.pdf", "a.pdf"]
+    assert semantic_sources(index, embeddings, A_TEXTS[0]).count("a.pdf") == 2
+
+
+def test_replacing_with_an_earlier_version(embeddings):
+    index = corpus(embeddings)
+    index = add_file(index, "a.pdf", "a2a2a2a2a2a2a2", ["alpha kiwis"], embeddings)
+    index = add_file(index, "a.pdf", "aaaaaaaaaaaaaa", A_TEXTS, embeddings)
+    assert index.manifest["files"]["a.pdf"] == "aaaaaaaaaaaaaa"
+    assert keyword_sources(index, "alpha") == ["a.pdf", "a.pdf"]
+    assert keyword_sources(index.compacted(), "kiwis") == []
+
+
+def test_delete_re_upload_and_compact_twice_removes_every_copy(embeddings):
+    # Delete a.pdf, upload it again, compact, delete it again, compact
+    index = corpus(embeddings)
+    index = index.without_source("a.pdf")
+    index = add_file(index, "a.pdf", "aaaaaaaaaaaaaa", A_TEXTS, embeddings).compacted()
+    assert keyword_sources(index, "alpha") == ["a.pdf", "a.pdf"]
+
+    index = index.without_source("a.pdf").compacted()
+    assert "a.pdf" not in index.manifest["files"]
+    assert keyword_sources(index, "alpha") == []
+    assert "a.pdf" not in semantic_sources(index, embeddings, A_TEXTS[0])
+    assert {record.source for record in index.chunks.records.values()} == {"b.pdf"}
+    assert index.vector_store.index.ntotal == len(B_TEXTS)
+
+
+def test_added_vectors_are_appended_then_folded_into_the_faiss_index(embeddings, monkeypatch):
+    monkeypatch.setattr(rag_index, "APPEND_FOLD_MIN_VECTORS", 4)
+    index = corpus(embeddings)
+    index = add_file(index, "c.pdf", "cccccccccccccc", ["gamma dates meadow", "gamma figs meadow"], embeddings)
+    assert len(index.appended) == 2
+    assert index.vector_store.index.ntotal == 10
+    assert top_chunk(index, embeddings, "gamma figs meadow") == ("gamma figs meadow", 1.0)
+
+    # A second branch from the same bundle must not see the first one's vectors
+    branch = add_file(index.without_source("c.pdf"), "d.pdf", "dddddddddddddd", ["delta"], embeddings)
+    index = add_file(index, "e.pdf", "eeeeeeeeeeeeee", ["epsilon one", "epsilon two"], embeddings)
+    assert index.appended is None
+    assert index.vector_store.index.ntotal == 14
+    assert top_chunk(index, embeddings, "epsilon two") == ("epsilon two", 1.0)
+    assert top_chunk(index, embeddings, "gamma dates meadow") == ("gamma dates meadow", 1.0)
+    assert "d.pdf" not in semantic_sources(index, embeddings, "delta", k=20)
+
+    assert branch.appended.keys.tolist() == [10, 11, 12]
+    assert top_chunk(branch, embeddings, "delta") == ("delta", 1.0)
+    assert sorted(set(semantic_sources(branch, embeddings, "delta", k=20))) == ["a.pdf", "b.pdf", "d.pdf"]
+
+    compacted = branch.compacted()
+    assert compacted.appended is None
+    assert compacted.vector_store.index.ntotal == 11
+    assert top_chunk(compacted, embeddings, "delta") == ("delta", 1.0)
+
+
+def cited_sources(index, embeddings, text):
+    """Files each chunk matching text would be cited as, as /ask credits them"""
+    query = np.asarray([embeddings.embed_query(text)], dtype=np.float32)
+    hits = [doc for doc, _ in index.search_by_vectors(query, 10)[0]] + index.keyword_search("shared", 10)
+    return [
+        (doc.metadata["source"], tuple(sorted(doc.metadata.get("sources") or [doc.metadata["source"]])))
+        for doc in hits if "shared" in doc.page_content
+    ]
+
+
+def test_deleting_the_original_of_a_near_duplicate_cites_the_remaining_copy(embeddings):
+    shared = "shared passage about the quarterly revenue figures reported by every regional office this year"
+    index = build_index({"a.pdf": ("aaaaaaaaaaaaaa", [shared]), "b.pdf": ("bbbbbbbbbbbbbb", B_TEXTS)},
+                        embeddings, near_duplicates=True)
+    index = add_file(index, "c.pdf", "cccccccccccccc", [shared], embeddings)
+    assert index.manifest["aliases"]
+    assert set(cited_sources(index, embeddings, shared)) == {("a.pdf", ("a.pdf", "c.pdf"))}
+
+    deleted = index.without_source("a.pdf")
+    assert set(cited_sources(deleted, embeddings, shared)) == {("c.pdf", ("c.pdf",))}
+    assert set(cited_sources(deleted.compacted(), embeddings, shared)) == {("c.pdf", ("c.pdf",))}
+    assert set(cited_sources(index, embeddings, shared)) == {("a.pdf", ("a.pdf", "c.pdf"))}
+
+    # Once the last file pointing to the retained chunk goes, it is dropped
+    assert cited_sources(deleted.without_source("c.pdf"), embeddings, shared) == []
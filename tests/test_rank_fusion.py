@@ -0,0 +1,64 @@
+import pytest
+from langchain_core.documents import Document
+
+from rank_fusion import RRF_K, document_key, fuse, fuse_hybrid
+
+
+def doc(key, text=None):
+    return Document(page_content=text or f"chunk {key}", metadata={"chunk_key": key, "chunk_id": f"a.pdf:h:i:{key}"})
+
+
+def keys(fused):
+    return [document_key(document) for document, _ in fused]
+
+
+def test_documents_are_matched_on_chunk_key():
+    assert document_key(doc(3)) == 3
+    assert document_key(Document(page_content="x", metadata={"chunk_id": "a.pdf:h:i:0"})) == "a.pdf:h:i:0"
+    assert document_key(Document(page_content="x", metadata={})) == "x"
+
+
+def test_rrf_credits_documents_found_by_both_lists():
+    semantic = [(doc(1), 0.9), (doc(2), 0.8), (doc(3), 0.7)]
+    keyword = [(doc(3), 12.0), (doc(4), 10.0)]
+    fused = fuse([semantic, keyword], limit=10, method="rrf")
+    assert keys(fused) == [3, 1, 2, 4]
+    assert fused[0][1] == pytest.approx(1 / (RRF_K + 3) + 1 / (RRF_K + 1))
+
+
+def test_rrf_counts_a_document_once_per_list():
+    fused = fuse([[(doc(1), 0.9), (doc(1), 0.8), (doc(2), 0.7)]], limit=10, method="rrf")
+    assert keys(fused) == [1, 2]
+    assert fused[0][1] == pytest.approx(1 / (RRF_K + 1))
+    assert fused[1][1] == pytest.approx(1 / (RRF_K + 3))
+
+
+def test_weighted_fusion_normalizes_each_list():
+    semantic = [(doc(1), 0.9), (doc(2), 0.5), (doc(3), 0.1)]
+    keyword = [(doc(3), 40.0), (doc(2), 20.0)]
+    fused = fuse([semantic, keyword], limit=10, method="weighted", weights=[0.5, 0.5])
+    assert dict(zip(keys(fused), [score for _, score in fused])) == pytest.approx({1: 0.5, 2: 0.25, 3: 0.5})
+    # A list of equal scores gives each of its documents the full weight
+    assert [score for _, score in fuse([[(doc(1), 2.0), (doc(2), 2.0)]], limit=10, method="weighted")] == [1.0, 1.0]
+
+
+def test_limit_ties_and_first_seen_document():
+    first, second = doc(1, "semantic copy"), doc(1, "keyword copy")
+    fused = fuse([[(first, 0.9), (doc(2), 0.8)], [(second, 5.0), (doc(5), 4.0)]], limit=2, method="rrf")
+    assert keys(fused) == [1, 2]
+    assert fused[0][0] is first
+    # Equal fused scores keep the order documents were first seen in
+    assert keys(fuse([[(doc(7), 1.0)], [(doc(8), 1.0)]], limit=10, method="rrf")) == [7, 8]
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        fuse([[(doc(1), 1.0)]], limit=1, method="borda")
+
+
+def test_fuse_hybrid_weights_the_semantic_branch():
+    semantic = [(doc(1), 0.9), (doc(2), 0.1)]
+    keyword = [(doc(2), 9.0), (doc(1), 1.0)]
+    assert [document_key(d) for d in fuse_hybrid(semantic, keyword, 2, "weighted", semantic_weight=0.8)] == [1, 2]
+    assert [document_key(d) for d in fuse_hybrid(semantic, keyword, 2, "weighted", semantic_weight=0.2)] == [2, 1]
+    assert fuse_hybrid([], [], 5, "rrf") == []
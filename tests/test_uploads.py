@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import os
+import threading
+
+import pytest
+
+from uploads import UploadTooLarge, claim_path, receive_files, safe_pdf_name
+
+BOUNDARY = "----test-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def multipart_body(parts):
+    """parts: (field, filename or None, data) tuples"""
+    body = b""
+    for field, filename, data in parts:
+        disposition = f'form-data; name="{field}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def in_chunks(body, size=7):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def receive(body, tmp_path, **kwargs):
+    return asyncio.run(receive_files(in_chunks(body), CONTENT_TYPE, str(tmp_path), **kwargs))
+
+
+def test_file_parts_are_written_and_hashed_while_streaming(tmp_path):
+    data = os.urandom(5000)
+    body = multipart_body([("note", None, b"ignored"), ("file", "a.pdf", data), ("other", "b.pdf", b"x")])
+    [received] = receive(body, tmp_path)
+    assert received.filename == "a.pdf"
+    assert received.size == len(data)
+    assert received.sha256 == hashlib.sha256(data).hexdigest()
+    with open(received.path, "rb") as f:
+        assert f.read() == data
+    # Temporary files are dot-files the folder watcher ignores
+    assert os.path.basename(received.path).startswith(".")
+
+
+def test_oversized_part_is_rejected_and_others_kept(tmp_path):
+    body = multipart_body([("file", "big.pdf", b"x" * 200), ("file", "small.pdf", b"y" * 50)])
+    big, small = receive(body, tmp_path, max_bytes=lambda name: 100)
+    assert big.path is None and "too large" in big.error
+    assert small.error is None and small.size == 50
+    assert os.listdir(tmp_path) == [os.path.basename(small.path)]
+
+
+def test_abort_stops_at_the_limit_and_removes_everything(tmp_path):
+    body = multipart_body([("file", "a.pdf", b"a" * 10), ("file", "b.pdf", b"b" * 200)])
+    consumed = []
+
+    async def tracked():
+        async for chunk in in_chunks(body):
+            consumed.append(chunk)
+            yield chunk
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(receive_files(tracked(), CONTENT_TYPE, str(tmp_path), max_bytes=lambda name: 100,
+                                  abort_oversized=True))
+    assert sum(map(len, consumed)) < len(body)
+    assert os.listdir(tmp_path) == []
+
+
+def test_skipped_types_are_listed_without_being_stored(tmp_path):
+    body = multipart_body([("file", "notes.txt", b"text")])
+    [received] = receive(body, tmp_path, max_bytes=lambda name: None)
+    assert received.filename == "notes.txt" and received.path is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_invalid_bodies_raise_value_error(tmp_path):
+    with pytest.raises(ValueError):
+        asyncio.run(receive_files(in_chunks(b"data"), "application/pdf", str(tmp_path)))
+    truncated = multipart_body([("file", "a.pdf", b"a" * 100)])[:80]
+    with pytest.raises(ValueError):
+        receive(truncated, tmp_path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_claim_path_numbers_taken_and_reserved_names(tmp_path):
+    folder = str(tmp_path)
+    first = claim_path(folder, "report.pdf")
+    assert first == os.path.join(folder, "report.pdf") and os.path.exists(first)
+    assert claim_path(folder, "report.pdf") == os.path.join(folder, "report_1.pdf")
+    # Names of documents in other corpus folders count as taken too
+    assert claim_path(folder, "notes.pdf", reserved={"notes.pdf", "notes_1.pdf"}) == os.path.join(folder, "notes_2.pdf")
+    assert claim_path(folder, "report.pdf", reserved={"report_2.pdf"}) == os.path.join(folder, "report_3.pdf")
+
+
+def test_concurrent_claims_get_distinct_paths(tmp_path):
+    paths, start = [], threading.Barrier(8)
+
+    def claim():
+        start.wait()
+        paths.append(claim_path(str(tmp_path), "same.pdf"))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(paths)) == 8
+    assert sorted(os.listdir(tmp_path)) == sorted(["same.pdf"] + [f"same_{i}.pdf" for i in range(1, 8)])
+
+
+def test_safe_pdf_name_strips_paths_and_unsafe_characters():
+    assert safe_pdf_name("../../etc/passwd.pdf") == "passwd.pdf"
+    assert safe_pdf_name("Annual report (2024).PDF") == "Annual_report_2024.pdf"
+    assert safe_pdf_name("...") == "document.pdf"
@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO, Callable, Collection, Dict, List, Optional, Tuple
+
+# ============================================================================
+# STREAMED UPLOAD STORAGE
+# ============================================================================
+#
+# Uploads are copied to a hidden temporary file in the destination folder in
+# fixed-size blocks. The SHA-256 and the size are computed from the same
+# blocks, so an oversized upload is rejected as soon as it crosses the limit
+# and a duplicate is recognized without reading the file again. Temporary
+# files are dot-files, which the folder watcher ignores. These functions
+# block and are meant to run in a worker thread.
+#
+# Upload endpoints do not let the framework parse their multipart form,
+# since that spools the whole body to a temporary file before the handler
+# runs. receive_files() parses the request body as it arrives instead and
+# writes each file part straight to its temporary file, so a body declared
+# too large is refused before it is read and an oversized part is cut off
+# at the limit.
+
+MAX_UPLOAD_BYTES = int(os.getenv("RAG_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+MAX_BULK_UPLOAD_BYTES = int(os.getenv("RAG_MAX_BULK_UPLOAD_MB", "500")) * 1024 * 1024  # Per zip archive
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Allowance for boundaries and part headers around a file
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size limit"""
+
+
+def too_large_message(max_bytes: int) -> str:
+    return f"File size too large. Maximum {max_bytes // (1024 * 1024)}MB allowed."
+
+
+def safe_pdf_name(filename: str) -> str:
+    """Filesystem-safe base name for an uploaded PDF"""
+    base_name = os.path.splitext(os.path.basename(filename or ""))[0]
+    base_name = re.sub(r"[^\w.-]+", "_", base_name).strip("._") or "document"
+    return f"{base_name}.pdf"
+
+
+class UploadWriter:
+    """Temporary file an upload is written to block by block, hashed and size-checked on the way"""
+
+    def __init__(self, dest_dir: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        os.makedirs(dest_dir, exist_ok=True)
+        self.path = os.path.join(dest_dir, f".upload-{uuid.uuid4().hex}.part")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._file = open(self.path, "wb")
+
+    def write(self, block: bytes):
+        self.size += len(block)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(too_large_message(self.max_bytes))
+        self._digest.update(block)
+        self._file.write(block)
+
+    def finish(self) -> Tuple[str, str, int]:
+        """Close the file; returns (path, sha256 hex digest, size)"""
+        self._file.close()
+        return self.path, self._digest.hexdigest(), self.size
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def stream_to_temp(source: BinaryIO, dest_dir: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                   block_size: int = UPLOAD_BLOCK_SIZE) -> Tuple[str, str, int]:
+    """Copy a stream to a temporary file; returns (path, sha256 hex digest, size)"""
+    writer = UploadWriter(dest_dir, max_bytes)
+    try:
+        for block in iter(lambda: source.read(block_size), b""):
+            writer.write(block)
+    except BaseException:
+        writer.discard()
+        raise
+    return writer.finish()
+
+
+@dataclass
+class ReceivedFile:
+    """One file part of a multipart upload, stored in a temporary file unless rejected"""
+    filename: str
+    path: Optional[str] = None
+    sha256: str = ""
+    size: int = 0
+    error: Optional[str] = None
+
+
+class MultipartFileReceiver:
+    """Incremental multipart/form-data parser writing the file parts of one field to temporary files.
+
+    max_bytes gives the size limit for a file by name, or None to skip the
+    file's data (it is listed without a path). A part over its limit is
+    rejected and the rest of its data dropped, or with abort_oversized the
+    parser raises UploadTooLarge right away. Other fields are ignored.
+    """
+
+    def __init__(self, content_type: str, dest_dir: str, field: str, max_bytes: Callable[[str], Optional[int]],
+                 abort_oversized: bool = False):
+        from python_multipart.multipart import MultipartParser, parse_options_header
+
+        self._parse_options_header = parse_options_header
+        mime_type, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if mime_type != b"multipart/form-data" or not boundary:
+            raise ValueError("Expected a multipart/form-data body")
+        self.dest_dir = dest_dir
+        self.field = field
+        self.max_bytes = max_bytes
+        self.abort_oversized = abort_oversized
+        self.files: List[ReceivedFile] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = self._header_value = b""
+        self._current: Optional[ReceivedFile] = None
+        self._writer: Optional[UploadWriter] = None
+        self._ended = False
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+
+    def write(self, chunk: bytes):
+        self._parser.write(chunk)
+
+    def finish(self) -> List[ReceivedFile]:
+        self._parser.finalize()
+        if not self._ended:
+            raise ValueError("Multipart body ended before its closing boundary")
+        return self.files
+
+    def discard(self):
+        """Remove every temporary file written so far"""
+        if self._writer is not None:
+            self._writer.discard()
+            self._writer = None
+        for received in self.files:
+            if received.path and os.path.exists(received.path):
+                os.remove(received.path)
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = self._parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("utf-8", "replace") != self.field or b"filename" not in options:
+            return
+        self._current = ReceivedFile(filename=options[b"filename"].decode("utf-8", "replace"))
+        self.files.append(self._current)
+        limit = self.max_bytes(self._current.filename)
+        if limit is not None:
+            self._writer = UploadWriter(self.dest_dir, limit)
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._writer is None:
+            return
+        try:
+            self._writer.write(data[start:end])
+        except UploadTooLarge as e:
+            self._writer.discard()
+            self._writer = None
+            if self.abort_oversized:
+                raise
+            self._current.error = str(e)
+
+    def _on_part_end(self):
+        if self._writer is not None:
+            self._current.path, self._current.sha256, self._current.size = self._writer.finish()
+        self._writer = self._current = None
+
+    def _on_end(self):
+        self._ended = True
+
+
+async def receive_files(chunks: AsyncIterator[bytes], content_type: str, dest_dir: str, field: str = "file",
+                        max_bytes: Callable[[str], Optional[int]] = lambda filename: MAX_UPLOAD_BYTES,
+                        abort_oversized: bool = False) -> List[ReceivedFile]:
+    """Stream a multipart request body, storing the files of one field in temporary files.
+
+    Parsing and writing run in a worker thread, one received chunk at a
+    time. If the body cannot be read or parsed, every file stored so far is
+    removed and the error raised.
+    """
+    receiver = MultipartFileReceiver(content_type, dest_dir, field, max_bytes, abort_oversized)
+    try:
+        async for chunk in chunks:
+            if chunk:
+                await asyncio.to_thread(receiver.write, chunk)
+        return await asyncio.to_thread(receiver.finish)
+    except BaseException:
+        receiver.discard()
+        raise
+
+
+def claim_path(dest_dir: str, filename: str, reserved: Collection[str] = ()) -> str:
+    """Reserve a free path for filename, adding _1, _2, ... when it is taken.
+
+    Names in reserved (e.g. documents in other folders) count as taken.
+    """
+    base_name, ext = os.path.splitext(filename)
+    candidate, i = filename, 1
+    while True:
+        path = os.path.join(dest_dir, candidate)
+        if candidate in reserved:
+            candidate = f"{base_name}_{i}{ext}"
+            i += 1
+            continue
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            candidate = f"{base_name}_{i}{ext}"
+            i += 1